@@ -0,0 +1,144 @@
+# Backends de consultas das guias (pedidos.consultas): confere que arrow e
+# sqlite devolvem o mesmo resultado que pandas para os filtros, totais,
+# contagens e páginas ordenadas, e mede o tempo de cada um sobre dados
+# sintéticos (bench.gerador).
+#
+#   python -m bench.bench_consultas [--linhas 100000 1000000] [--repeticoes 3]
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bench.gerador import gerar_pedidos
+from pedidos.armazem import Armazem
+from pedidos.consultas import BACKENDS, ConsultasArrow, ConsultasPandas, ConsultasSQLite
+from pedidos.indices import IndiceFiltros
+from pedidos.preparo import preparar_pedidos
+
+AGORA = datetime(2024, 10, 20)
+EM_ABERTO = ['Pendente', 'Atrasado']
+# Uma coluna de cada tipo: categoria, texto, número e data
+ORDENACOES = ['Fantasia', 'Nr.pedido', 'Valor Total', 'Prev.entrega', 'Status', 'Setor']
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+# Consultas feitas por uma execução das guias: (nome, função(consultas))
+def consultas_das_guias(df):
+    cliente = df['Fantasia'].value_counts().index[0]
+    pedido = str(df['Ped. Cliente'].dropna().iloc[0])[:3]
+    # Busca sem acento e em minúsculas por um trecho do Modelo ('... CT05PÇS')
+    modelo = 'ct05pcs'
+    filtros = {
+        'carteira': {},
+        'carteira_cliente': {'cliente': cliente},
+        'carteira_busca_pedido': {'busca': pedido},
+        'carteira_busca_modelo': {'busca': modelo},
+        'carteira_busca_curta': {'busca': '7'},
+        'carteira_busca_palavras': {'busca': f'produto {modelo} 1'},
+        'separacao': {'setor': 'Separação', 'status': EM_ABERTO},
+        'compras_atrasado': {'setor': 'Compras', 'status': 'Atrasado'},
+        'separacao_cliente_busca': {'setor': 'Separação', 'status': EM_ABERTO, 'cliente': cliente, 'busca': pedido},
+    }
+    lista = []
+    for nome, filtro in filtros.items():
+        lista.append((f'filtrar_{nome}', lambda c, filtro=filtro: c.filtrar(**filtro)))
+    abertos = lambda c: c.filtrar(setor='Separação', status=EM_ABERTO)
+    lista += [
+        ('valores_clientes', lambda c: sorted(c.valores('Fantasia', abertos(c)))),
+        ('colunas_preenchidas', lambda c: c.colunas_preenchidas(abertos(c))),
+        ('somar', lambda c: round(c.somar('Valor Total', abertos(c)), 2)),
+        ('por_status', lambda c: {s: (n, round(v, 2)) for s, (n, v) in c.por_status(c.filtrar()).items()}),
+    ]
+    for coluna in ORDENACOES:
+        for crescente in (True, False):
+            lista.append((
+                f"pagina_{coluna}_{'asc' if crescente else 'desc'}",
+                lambda c, coluna=coluna, crescente=crescente: c.pagina(c.filtrar(), list(df.columns), coluna, crescente, 0, 200),
+            ))
+    # Sem ordenação escolhida, a página de uma busca vem por relevância
+    for termo in (pedido, modelo, '00', f'{pedido[:2]} pcs'):
+        lista.append((f'pagina_busca_{termo}', lambda c, termo=termo: c.pagina(c.filtrar(busca=termo), list(df.columns), None, True, 0, 200)))
+    # Busca que acha todas as linhas ('c' de CLIENTE e CTxxPÇS), mas não na ordem
+    # da tabela, com ordenação escolhida
+    lista.append(('pagina_busca_todas_valor', lambda c: c.pagina(c.filtrar(busca='c'), list(df.columns), 'Valor Total', True, 0, 200)))
+    lista.append(('pagina_separacao_cliente', lambda c: c.pagina(abertos(c), list(df.columns), 'Fantasia', True, 100, 300)))
+    return lista
+
+
+# Resultados comparáveis: páginas viram DataFrame sem índice, nos mesmos tipos;
+# seleções do sqlite (sem posições) comparam só o número de linhas
+def _normalizar(resultado):
+    if isinstance(resultado, pd.DataFrame):
+        return resultado.reset_index(drop=True).astype(object).where(resultado.notna().to_numpy(), None)
+    if hasattr(resultado, 'to_pandas'):
+        return _normalizar(resultado.to_pandas())
+    if isinstance(resultado, np.ndarray):
+        return resultado.tolist()
+    return resultado
+
+
+def iguais(a, b):
+    if hasattr(b, 'onde'):
+        return len(a) == len(b)
+    a, b = _normalizar(a), _normalizar(b)
+    if isinstance(a, pd.DataFrame):
+        try:
+            pd.testing.assert_frame_equal(a, b, check_dtype=False)
+            return True
+        except AssertionError:
+            return False
+    return a == b
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--linhas', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    diferentes = 0
+    for linhas in args.linhas:
+        df = preparar_pedidos(gerar_pedidos(linhas), AGORA)
+        with tempfile.TemporaryDirectory() as diretorio:
+            def armazem():
+                consultas = ConsultasSQLite(Armazem(os.path.join(diretorio, 'pedidos.sqlite')))
+                consultas.armazem.sincronizar(df, AGORA)
+                return consultas
+
+            montagem = {
+                'pandas': lambda: ConsultasPandas(df, IndiceFiltros(df)),
+                'arrow': lambda: ConsultasArrow.de_dataframe(df),
+                'sqlite': armazem,
+            }
+            backends, tempos = {}, {}
+            for nome in BACKENDS:
+                tempos[nome], backends[nome] = cronometrar(montagem[nome], 1)
+            print(f"\n{len(df)} linhas preparadas ({linhas} geradas), tempos em ms")
+            print(f"{'consulta':<40}" + ''.join(f" {nome:>10}" for nome in BACKENDS) + f" {'iguais':>7}")
+            print(f"{'montagem':<40}" + ''.join(f" {tempos[nome] * 1000:>10.1f}" for nome in BACKENDS))
+            for nome, consulta in consultas_das_guias(df):
+                resultados = {}
+                for backend in BACKENDS:
+                    tempos[backend], resultados[backend] = cronometrar(lambda: consulta(backends[backend]), args.repeticoes)
+                ok = all(iguais(resultados['pandas'], resultados[backend]) for backend in BACKENDS[1:])
+                diferentes += not ok
+                print(f"{nome:<40}" + ''.join(f" {tempos[backend] * 1000:>10.1f}" for backend in BACKENDS) + f" {'sim' if ok else 'NÃO':>7}")
+
+    if diferentes:
+        raise SystemExit(f"{diferentes} consultas com resultados diferentes entre os backends")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# Benchmark do pipeline completo sobre exportações sintéticas (bench.gerador):
+# leitura, preparo, status, setores, agregados, índices, filtros de cada guia
+# e gráficos do Dashboard. Grava um relatório JSON para comparar commits.
+#
+#   python -m bench.bench_pipeline [--linhas 10000 100000 1000000 5000000]
+#                                  [--repeticoes 3] [--limite-xlsx 100000]
+#                                  [--saida bench_pipeline.json] [--comparar anterior.json]
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bench.gerador import gerar_pedidos, gravar_planilha
+from pedidos.agregados import contar_modelos, dimensao_produtos, montar_cubo, somar_cubo
+from pedidos.graficos import TOP_PRODUTOS, create_percentage_chart, create_value_bar_chart, create_value_bar_chart2, figura_no_limite
+from pedidos.indices import IndiceFiltros
+from pedidos.ingestao import ler_planilhas
+from pedidos.mudancas import comparar_exportacoes
+from pedidos.preparo import preparar_pedidos
+from pedidos.setores import atribuir_setor
+from pedidos.sla import calcular_prazos
+from pedidos.status import FilaPrazos, atualizar_status_desdobrados, classificar_status
+
+AGORA = datetime(2024, 10, 20)
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Tempos (melhor de `repeticoes`) de cada etapa para uma planilha com `linhas` itens
+def medir(linhas, repeticoes, limite_xlsx):
+    tempos = {}
+
+    def etapa(nome, funcao, vezes=repeticoes):
+        tempos[nome], resultado = cronometrar(funcao, vezes)
+        return resultado
+
+    bruto = etapa('gerar', lambda: gerar_pedidos(linhas), 1)
+
+    # Leitura: XLSX (sem cache, uma vez) e cópia colunar. Gravar XLSX grande leva
+    # muito tempo, então acima de `limite_xlsx` linhas a leitura não é medida.
+    if linhas <= limite_xlsx:
+        with tempfile.TemporaryDirectory() as diretorio:
+            gravar_planilha(bruto, os.path.join(diretorio, 'PEDIDOS_VOLPE1.XLSX'))
+            etapa('leitura_xlsx', lambda: ler_planilhas(diretorio), 1)
+            etapa('leitura_cache', lambda: ler_planilhas(diretorio))
+
+    preparado = etapa('preparo', lambda: preparar_pedidos(bruto, AGORA))
+
+    # Exportação seguinte: 1% das linhas faturadas, 1% reprogramadas e 0,5% removidas
+    seguinte = bruto.copy()
+    rng = np.random.default_rng(1)
+    sorteadas = rng.permutation(len(bruto))
+    um_por_cento = max(1, len(bruto) // 100)
+    seguinte.loc[seguinte.index[sorteadas[:um_por_cento]], 'Dt.fat.'] = AGORA
+    seguinte.loc[seguinte.index[sorteadas[um_por_cento:2 * um_por_cento]], 'Prev.entrega'] = AGORA
+    seguinte = seguinte.drop(seguinte.index[sorteadas[2 * um_por_cento:2 * um_por_cento + um_por_cento // 2]])
+    etapa('mudancas', lambda: comparar_exportacoes(bruto, seguinte))
+
+    # Etapas do preparo isoladas, sobre as linhas que sobraram das exclusões
+    entrada = preparado[['Nr.pedido', 'Fantasia', 'Dt.fat.', 'Prazo']].assign(Status='Pendente')
+
+    def status_desdobrados():
+        df = entrada.copy()
+        atualizar_status_desdobrados(df)
+        return df
+
+    desdobrados = etapa('status_desdobrados', status_desdobrados)
+    etapa('status_classificar', lambda: classificar_status(desdobrados, AGORA))
+    etapa('setor', lambda: atribuir_setor(preparado['Nr.pedido']))
+    etapa('prazos_sla', lambda: calcular_prazos(preparado))
+    etapa('fila_prazos', lambda: FilaPrazos(preparado))
+
+    cubo = etapa('cubo', lambda: montar_cubo(preparado).reset_index())
+    produtos = etapa('dimensao_produtos', lambda: dimensao_produtos(contar_modelos(preparado)))
+
+    indice = etapa('indices', lambda: IndiceFiltros(preparado))
+    cliente = preparado['Fantasia'].value_counts().index[0]
+    etapa('filtro_carteira_cliente', lambda: preparado.iloc[indice.posicoes(cliente=cliente)])
+    etapa('filtro_carteira_pedido', lambda: preparado.iloc[indice.busca.buscar('41')])
+    etapa('filtro_carteira_cliente_pedido_status', lambda: preparado.iloc[indice.posicoes(cliente=cliente, busca='41', status='Pendente')])
+    etapa('filtro_separacao', lambda: preparado.iloc[indice.posicoes(setor='Separação', status='Pendente')])
+    etapa('filtro_compras', lambda: preparado.iloc[indice.posicoes(setor='Compras', status='Pendente')])
+
+    por_status = somar_cubo(cubo, 'Status')
+    # Gráficos como o Dashboard monta na primeira vez: figura e JSON dentro do limite
+    etapa('grafico_percentual', lambda: figura_no_limite(lambda: create_percentage_chart(por_status)))
+    etapa('grafico_valor_status', lambda: figura_no_limite(lambda: create_value_bar_chart(por_status)))
+    etapa('grafico_referencia', lambda: figura_no_limite(lambda top: create_value_bar_chart2(cubo, produtos, 'Produto', 'Modelo', top), TOP_PRODUTOS))
+
+    return len(preparado), tempos
+
+
+def comparar(relatorio, anterior):
+    antes = {(r['linhas'], r['etapa']): r['segundos'] for r in anterior['resultados']}
+    print(f"\ncomparação com {anterior.get('commit')}:")
+    print(f"{'linhas':>10} {'etapa':<40} {'antes (s)':>10} {'agora (s)':>10} {'razão':>7}")
+    for r in relatorio['resultados']:
+        chave = (r['linhas'], r['etapa'])
+        if chave in antes and antes[chave] > 0:
+            print(f"{r['linhas']:>10} {r['etapa']:<40} {antes[chave]:>10.4f} {r['segundos']:>10.4f} {r['segundos'] / antes[chave]:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--limite-xlsx', type=int, default=100_000, help='maior planilha em que a leitura do XLSX é medida')
+    parser.add_argument('--saida', default='bench_pipeline.json')
+    parser.add_argument('--comparar', help='relatório anterior para comparar')
+    args = parser.parse_args()
+
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'repeticoes': args.repeticoes,
+        'resultados': [],
+    }
+    print(f"{'linhas':>10} {'preparadas':>11} {'etapa':<40} {'tempo (s)':>10}")
+    for linhas in args.linhas:
+        preparadas, tempos = medir(linhas, args.repeticoes, args.limite_xlsx)
+        for etapa, segundos in tempos.items():
+            relatorio['resultados'].append({'linhas': linhas, 'linhas_preparadas': preparadas, 'etapa': etapa, 'segundos': round(segundos, 6)})
+            print(f"{linhas:>10} {preparadas:>11} {etapa:<40} {segundos:>10.4f}")
+
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"relatório gravado em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar(relatorio, json.load(arquivo))
+
+
+if __name__ == '__main__':
+    main()
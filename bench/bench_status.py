@@ -0,0 +1,71 @@
+# Micro-benchmark da classificação de status: apply linha a linha (versão antiga
+# do sist.py) contra a classificação vetorizada de pedidos.status.
+#
+#   python -m bench.bench_status [--linhas 100000 1000000] [--repeticoes 3]
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pedidos.status import classificar_status
+
+
+def gerar_frame(linhas, semente=0):
+    rng = np.random.default_rng(semente)
+    agora = datetime.now()
+    dias = pd.to_timedelta(rng.integers(-30, 30, linhas), unit='D')
+    dt_fat = pd.Series(pd.Timestamp(agora) + dias)
+    dt_fat[rng.random(linhas) < 0.5] = pd.NaT
+    prev = pd.Series(pd.Timestamp(agora) + pd.to_timedelta(rng.integers(-10, 20, linhas), unit='D'))
+    prev[rng.random(linhas) < 0.3] = pd.NaT
+    atualizado = rng.random(linhas) < 0.02
+    return pd.DataFrame({
+        'Status': np.where(atualizado, rng.choice(['Pendente', 'Entregue'], linhas), 'Pendente'),
+        'Status_Atualizado': atualizado,
+        'Dt.fat.': dt_fat,
+        'Prev.entrega': prev,
+        # Sem regras de SLA o prazo é a própria previsão de entrega
+        'Prazo': prev,
+    }), agora
+
+
+# Cópia da função que era aplicada com df.apply(update_status, axis=1)
+def update_status_linha(df, now):
+    def update_status(row):
+        if row['Status_Atualizado']:
+            return row['Status']
+        if pd.isnull(row['Dt.fat.']):
+            return 'Atrasado' if row['Prev.entrega'] < now else 'Pendente'
+        return 'Entregue'
+    return df.apply(update_status, axis=1)
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--linhas', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'apply (s)':>12} {'vetorizado (s)':>15} {'ganho':>8}")
+    for linhas in args.linhas:
+        df, agora = gerar_frame(linhas)
+        # O apply é lento demais para repetir em 1M de linhas; uma rodada basta
+        t_linha, esperado = cronometrar(lambda: update_status_linha(df, agora), 1)
+        t_vetor, obtido = cronometrar(lambda: classificar_status(df, agora), args.repeticoes)
+        assert list(obtido) == esperado.tolist(), 'classificações divergentes'
+        print(f"{linhas:>10} {t_linha:>12.3f} {t_vetor:>15.4f} {t_linha / t_vetor:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# Gerador de exportações sintéticas no formato PEDIDOS_VOLPE*.XLSX, para medir o
+# painel com volumes maiores que as planilhas reais de planilha/.
+#
+#   python -m bench.gerador 100000 /tmp/planilhas   (grava PEDIDOS_VOLPE1.XLSX)
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pedidos.preparo import CLIENTES_EXCLUIDOS
+from pedidos.status import CLIENTES_PEDIDO_DESDOBRADO
+
+# Clientes da carteira; a frequência segue uma lei de potência (poucos clientes
+# concentram a maior parte dos itens, como TELHANORTE nas planilhas reais)
+CLIENTES = ['TELHANORTE GUARULHOS', 'FERRAGENS CAMPEAO', 'COPAFER MATRIZ', 'FANAN', 'ALENCAR SUPERMERCADO',
+            'CONSTRUDECOR CAJAMAR', 'TERUYA S MIGUEL PAUL', 'COLOR DEK TINTAS', 'COPAFER MAUA', 'TELHANORTE BH'] \
+    + CLIENTES_PEDIDO_DESDOBRADO + [f'CLIENTE {i:03d}' for i in range(60)]
+
+UNIDADES = ['CT', 'UN', 'PAC', 'PT', 'CX', 'PEÇ', 'PC']
+ITENS_POR_PEDIDO = 15
+# Fração de linhas de clientes fora da carteira e de itens a granel (KG), que o preparo descarta
+FRACAO_EXCLUIDOS = 0.15
+FRACAO_KG = 0.07
+# Fração dos pedidos desdobrados em -02, -03 (sempre para os clientes de
+# CLIENTES_PEDIDO_DESDOBRADO, raramente para os outros)
+FRACAO_DESDOBRADOS = 0.08
+DATA_VAZIA = '  /  /'
+# Passo primo entre os produtos de um mesmo pedido (não repete dentro do pedido)
+PASSO_PRODUTO = 7919
+
+
+def _zipf(rng, quantidade, tamanho, expoente=1.1):
+    pesos = 1 / np.arange(1, quantidade + 1) ** expoente
+    return rng.choice(quantidade, size=tamanho, p=pesos / pesos.sum())
+
+
+# Planilha bruta com `linhas` itens, no mesmo formato que ler_planilhas devolve
+# (datas como datetime, vazias como NaT). Chaves (Nr.pedido, Produto) únicas.
+def gerar_pedidos(linhas, semente=0, inicio=datetime(2024, 10, 1), dias=30):
+    rng = np.random.default_rng(semente)
+    n_pedidos = max(1, linhas // ITENS_POR_PEDIDO)
+    n_produtos = int(min(20_000, max(ITENS_POR_PEDIDO * 4, linhas // 20)))
+    if n_produtos % PASSO_PRODUTO == 0:
+        n_produtos += 1
+
+    # Pedido de cada linha (ordenado, como na exportação) e posição do item no pedido
+    pedido = np.sort(rng.integers(0, n_pedidos, linhas))
+    primeira = np.searchsorted(pedido, pedido)
+    item = np.arange(linhas) - primeira
+
+    # Atributos por pedido
+    todos_clientes = np.array(CLIENTES + CLIENTES_EXCLUIDOS, dtype=object)
+    cliente_pedido = _zipf(rng, len(CLIENTES), n_pedidos)
+    fora = rng.random(n_pedidos) < FRACAO_EXCLUIDOS
+    cliente_pedido[fora] = len(CLIENTES) + rng.integers(0, len(CLIENTES_EXCLUIDOS), fora.sum())
+    desdobrado = np.isin(todos_clientes[cliente_pedido], CLIENTES_PEDIDO_DESDOBRADO) | (rng.random(n_pedidos) < FRACAO_DESDOBRADOS)
+    dt_pedido = pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, n_pedidos), unit='D')
+
+    # Nr.pedido: base de 7 dígitos e, nos desdobrados, sufixo -02/-03 em parte dos itens
+    sufixo = np.where(desdobrado[pedido], rng.integers(0, 3, linhas), 0)
+    rotulos_sufixo = np.array(['', '-02', '-03'], dtype=object)
+    codigo_nr = pedido * 3 + sufixo
+    unicos, inverso = np.unique(codigo_nr, return_inverse=True)
+    nr_pedido = np.array([f'{25000 + c // 3:07d}{rotulos_sufixo[c % 3]}' for c in unicos], dtype=object)[inverso]
+    ped_cliente = np.array([str(40000 + p) for p in range(n_pedidos)], dtype=object)[pedido]
+
+    # Produto: itens distintos dentro do pedido, a partir de um deslocamento
+    # concentrado nos produtos mais vendidos
+    deslocamento = _zipf(rng, n_produtos, n_pedidos, expoente=0.8)
+    produto = (deslocamento[pedido] + item * PASSO_PRODUTO) % n_produtos
+    codigos = np.array([f'P{p:05d}' for p in range(n_produtos)], dtype=object)
+    modelos = np.array([f'PRODUTO {p:05d} CT{(p % 12) + 1:02d}PÇS' for p in range(n_produtos)], dtype=object)
+    unidade = np.array(UNIDADES, dtype=object)[_zipf(rng, len(UNIDADES), n_produtos, expoente=2.0)][produto]
+    unidade[rng.random(linhas) < FRACAO_KG] = 'KG'
+
+    # Faturamento em 1..10 dias para ~40% dos itens; previsão de entrega para ~30%
+    dt_ped_linha = dt_pedido[pedido]
+    dt_fat = pd.Series(dt_ped_linha + pd.to_timedelta(rng.integers(1, 11, linhas), unit='D'))
+    dt_fat[rng.random(linhas) >= 0.4] = pd.NaT
+    prev = pd.Series(dt_ped_linha + pd.to_timedelta(rng.integers(3, 21, linhas), unit='D'))
+    prev[rng.random(linhas) >= 0.3] = pd.NaT
+
+    qtd = rng.integers(1, 100, linhas).astype(float)
+    valor_unit = np.round(rng.uniform(1, 300, n_produtos), 2)[produto]
+    return pd.DataFrame({
+        'Nr.pedido': nr_pedido,
+        'Ped. Cliente': ped_cliente,
+        'Dt.pedido': dt_ped_linha,
+        'Dt.fat.': dt_fat,
+        'Prev.entrega': prev,
+        'Emp': 3,
+        'Código': 1000 + cliente_pedido[pedido],
+        'Razão': todos_clientes[cliente_pedido][pedido],
+        'Fantasia': todos_clientes[cliente_pedido][pedido],
+        'UF': 'SP',
+        'Tp.Venda': 'VENDA',
+        'F.Pagto': '28',
+        'Vendedor': None,
+        '% Comissão': 2,
+        'Operador': 'DIANA',
+        '% Comissão.1': 0,
+        'Produto': codigos[produto],
+        'Modelo': modelos[produto],
+        'UN': unidade,
+        'Qtd.': qtd,
+        '% ICMS': 0,
+        '% IPI': 0,
+        'Valor Unit.': valor_unit,
+        'Valor Total': np.round(qtd * valor_unit, 2),
+        'Vl.Desc.': 0.0,
+    })
+
+
+# Grava como o ERP exporta: datas vazias como '  /  /'
+def gravar_planilha(df, caminho):
+    saida = df.copy()
+    for coluna in ['Dt.fat.', 'Prev.entrega']:
+        saida[coluna] = saida[coluna].astype(object).where(saida[coluna].notna(), DATA_VAZIA)
+    # to_excel escolhe o formato pela extensão, que o ERP grava em maiúsculas
+    temporario = f'{caminho}.tmp.xlsx'
+    saida.to_excel(temporario, index=False)
+    os.replace(temporario, caminho)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('linhas', type=int)
+    parser.add_argument('diretorio')
+    parser.add_argument('--numero', type=int, default=1, help='número da exportação (PEDIDOS_VOLPE<n>.XLSX)')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+    os.makedirs(args.diretorio, exist_ok=True)
+    caminho = os.path.join(args.diretorio, f'PEDIDOS_VOLPE{args.numero}.XLSX')
+    gravar_planilha(gerar_pedidos(args.linhas, args.semente), caminho)
+    print(caminho)
+
+
+if __name__ == '__main__':
+    main()
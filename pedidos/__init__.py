@@ -0,0 +1 @@
+# Pipeline de pedidos (ingestão e derivações) usado pelo painel em sist.py
@@ -0,0 +1,35 @@
+import argparse
+import json
+import logging
+from datetime import datetime
+
+from pedidos.armazem import Armazem
+from pedidos.ingestao import DIR_PLANILHAS
+from pedidos.pipeline import DIR_SAIDA_PADRAO, executar, gravar
+
+
+# Uso: python -m pedidos [--planilhas DIR] [--saida DIR] [--agora AAAA-MM-DDTHH:MM]
+#                       [--armazem ARQUIVO.sqlite]
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(prog='python -m pedidos', description='Prepara os pedidos e grava os dados e os indicadores sem abrir o painel.')
+    parser.add_argument('--planilhas', default=DIR_PLANILHAS, help='diretório com as exportações PEDIDOS_VOLPE*.XLSX')
+    parser.add_argument('--saida', default=DIR_SAIDA_PADRAO, help='diretório onde gravar o Parquet e o JSON')
+    parser.add_argument('--agora', type=datetime.fromisoformat, default=None, help='referência para o status Atrasado (padrão: agora)')
+    parser.add_argument('--so-indicadores', action='store_true', help='só imprime os indicadores, sem gravar arquivos')
+    parser.add_argument('--armazem', default=None, help='arquivo SQLite onde registrar as linhas e o histórico de status')
+    args = parser.parse_args(argumentos)
+
+    # Mensagens de progresso da ingestão vão para stderr; stdout fica só com o resultado
+    logging.basicConfig(level=logging.INFO, format='[%(name)s] %(message)s')
+    armazem = Armazem(args.armazem) if args.armazem else None
+    df, resumo = executar(args.planilhas, args.agora, armazem)
+    if args.so_indicadores:
+        print(json.dumps(resumo, ensure_ascii=False, indent=2))
+        return 0
+    for caminho in gravar(df, resumo, args.saida):
+        print(f"[pedidos] gravado {caminho}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
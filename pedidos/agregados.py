@@ -0,0 +1,58 @@
+import pandas as pd
+
+# Cubo de agregados do Dashboard: uma linha por combinação das dimensões, com
+# número de itens, quantidade e valor. O tamanho depende do número de grupos
+# distintos, não do número de itens da carteira.
+DIMENSOES_CUBO = ['Status', 'Fantasia', 'Produto', 'Setor', 'Mês']
+MEDIDAS_CUBO = ['itens', 'quantidade', 'valor']
+
+
+# Texto para chave de agrupamento, com '' no lugar de nulos (categorias inclusive)
+def _texto(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        if '' not in serie.cat.categories:
+            serie = serie.cat.add_categories([''])
+        return serie.fillna('')
+    return serie.fillna('').astype(str)
+
+
+def montar_cubo(df):
+    # Mês do pedido como AAAAMM (0 quando a data é desconhecida); textos vazios no
+    # lugar de nulos para que as chaves se alinhem ao combinar cubos
+    mes = df['Dt.pedido'].dt.year * 100 + df['Dt.pedido'].dt.month
+    chaves = [
+        df['Status'],
+        _texto(df['Fantasia']).rename('Fantasia'),
+        _texto(df['Produto']).rename('Produto'),
+        df['Setor'],
+        mes.fillna(0).astype(int).rename('Mês'),
+    ]
+    medidas = pd.DataFrame({'itens': 1, 'quantidade': df['Qtd.'], 'valor': df['Valor Total']}, index=df.index)
+    return medidas.groupby(chaves, observed=True).sum()
+
+
+# Soma o cubo (já com as dimensões como colunas) por uma ou mais dimensões
+def somar_cubo(cubo, por):
+    return cubo.groupby(por, observed=True)[MEDIDAS_CUBO].sum()
+
+
+# Itens por (Produto, Modelo), base da dimensão de produtos
+def contar_modelos(df):
+    return df.groupby([_texto(df['Produto']), _texto(df['Modelo'])], observed=True).size()
+
+
+# Dimensão de produtos: Produto -> Modelo canônico (o mais frequente; no empate,
+# o primeiro em ordem alfabética), para que cada produto tenha um só nome
+def dimensao_produtos(contagem_modelos):
+    ordenado = contagem_modelos[contagem_modelos > 0].sort_index().sort_values(ascending=False, kind='stable')
+    return ordenado.reset_index().drop_duplicates('Produto').set_index('Produto')['Modelo'].astype(object)
+
+
+# Mantém os `n` maiores valores da série e soma o resto em uma linha "Outros".
+# Devolve também quantas linhas foram agrupadas em "Outros".
+def top_n_com_outros(serie, n, rotulo='Outros'):
+    ordenado = serie.sort_values(ascending=False, kind='stable')
+    if len(ordenado) <= n:
+        return ordenado, 0
+    resto = ordenado.iloc[n:]
+    return pd.concat([ordenado.iloc[:n], pd.Series({rotulo: resto.sum()})]), len(resto)
@@ -0,0 +1,290 @@
+import contextlib
+import logging
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from pedidos.indices import CAMPOS_BUSCA, normalizar_busca
+from pedidos.ingestao import CHAVE_LINHA
+
+log = logging.getLogger(__name__)
+
+# Arquivo SQLite padrão do armazém (variável PEDIDOS_ARMAZEM muda o caminho)
+VARIAVEL_ARMAZEM = 'PEDIDOS_ARMAZEM'
+ARQUIVO_ARMAZEM = os.path.join('historico', 'pedidos.sqlite')
+
+# Colunas dos dados preparados (na ordem deles) -> colunas da tabela `itens`
+COLUNAS = {
+    'Nr.pedido': 'nr_pedido',
+    'Ped. Cliente': 'ped_cliente',
+    'Dt.pedido': 'dt_pedido',
+    'Dt.fat.': 'dt_fat',
+    'Prev.entrega': 'prev_entrega',
+    'Fantasia': 'fantasia',
+    'Produto': 'produto',
+    'Modelo': 'modelo',
+    'UN': 'un',
+    'Qtd.': 'qtd',
+    'Valor Unit.': 'valor_unit',
+    'Valor Total': 'valor_total',
+    'Status': 'status',
+    'Setor': 'setor',
+    'Prazo': 'prazo',
+}
+CHAVES = ['nr_pedido', 'produto']
+NUMERICAS = ('Qtd.', 'Valor Unit.', 'Valor Total')
+DATAS = ('Dt.pedido', 'Dt.fat.', 'Prev.entrega', 'Prazo')
+# Datas ficam como texto ISO: ordenam certo e funcionam com julianday()
+FORMATO_DATA = '%Y-%m-%d %H:%M:%S'
+# A coluna `busca` junta os CAMPOS_BUSCA normalizados, cada um entre separadores
+SEPARADOR_BUSCA = '\x1f'
+_CAMPOS_BUSCA = [COLUNAS[campo] for campo in CAMPOS_BUSCA]
+
+_DEFINICOES = ',\n    '.join(
+    f"{nome} {'REAL' if coluna in NUMERICAS else 'TEXT'}{' NOT NULL' if nome in CHAVES else ''}"
+    for coluna, nome in COLUNAS.items()
+)
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS itens (
+    {_DEFINICOES},
+    busca TEXT,
+    atualizado_em TEXT NOT NULL,
+    PRIMARY KEY (nr_pedido, produto)
+);
+CREATE INDEX IF NOT EXISTS itens_fantasia ON itens (fantasia);
+CREATE INDEX IF NOT EXISTS itens_status ON itens (status);
+CREATE INDEX IF NOT EXISTS itens_setor_status ON itens (setor, status);
+CREATE INDEX IF NOT EXISTS itens_dt_pedido ON itens (dt_pedido);
+CREATE INDEX IF NOT EXISTS itens_dt_fat ON itens (dt_fat);
+CREATE INDEX IF NOT EXISTS itens_prev_entrega ON itens (prev_entrega);
+CREATE INDEX IF NOT EXISTS itens_prazo ON itens (prazo);
+
+-- Índice de trigramas da busca, mantido pelos gatilhos (GATILHOS_BUSCA)
+CREATE VIRTUAL TABLE IF NOT EXISTS itens_busca USING fts5(busca, content='itens', content_rowid='rowid', tokenize='trigram');
+
+CREATE TABLE IF NOT EXISTS transicoes (
+    nr_pedido TEXT NOT NULL,
+    produto TEXT NOT NULL,
+    de TEXT,
+    para TEXT,
+    em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transicoes_linha ON transicoes (nr_pedido, produto, em);
+CREATE INDEX IF NOT EXISTS transicoes_para ON transicoes (para, em);
+"""
+
+# Gatilhos que mantêm `itens_busca` a cada gravação em `itens`
+GATILHOS_BUSCA = {
+    'itens_busca_insercao': """AFTER INSERT ON itens BEGIN
+    INSERT INTO itens_busca (rowid, busca) VALUES (new.rowid, new.busca);
+END""",
+    'itens_busca_remocao': """AFTER DELETE ON itens BEGIN
+    INSERT INTO itens_busca (itens_busca, rowid, busca) VALUES ('delete', old.rowid, old.busca);
+END""",
+    'itens_busca_alteracao': """AFTER UPDATE OF busca ON itens BEGIN
+    INSERT INTO itens_busca (itens_busca, rowid, busca) VALUES ('delete', old.rowid, old.busca);
+    INSERT INTO itens_busca (rowid, busca) VALUES (new.rowid, new.busca);
+END""",
+}
+# Acima deste número de linhas gravadas de uma vez, o índice de trigramas é
+# refeito inteiro no fim (bem mais rápido que um gatilho por linha)
+LIMITE_GATILHOS = 10_000
+
+_NOMES = list(COLUNAS.values())
+_VALORES = [nome for nome in _NOMES if nome not in CHAVES]
+_UPSERT = (
+    f"INSERT INTO itens ({', '.join(_NOMES)}, busca, atualizado_em) VALUES ({', '.join('?' * (len(_NOMES) + 2))}) "
+    f"ON CONFLICT (nr_pedido, produto) DO UPDATE SET "
+    + ', '.join(f"{nome} = excluded.{nome}" for nome in _VALORES + ['busca', 'atualizado_em'])
+)
+
+
+def caminho_configurado():
+    return os.environ.get(VARIAVEL_ARMAZEM, ARQUIVO_ARMAZEM)
+
+
+# Linhas dos dados preparados nos tipos do SQLite (texto, REAL, None)
+def _linhas(df):
+    colunas = {}
+    for coluna, nome in COLUNAS.items():
+        serie = df[coluna]
+        if coluna in DATAS:
+            serie = serie.dt.strftime(FORMATO_DATA)
+        elif coluna in NUMERICAS:
+            serie = serie.astype('float64')
+        colunas[nome] = serie.to_numpy(dtype=object)
+    linhas = pd.DataFrame(colunas)
+    return linhas.where(linhas.notna(), None)
+
+
+# Coluna `busca` das linhas (nomes do SQLite); normaliza só os valores distintos
+def _coluna_busca(linhas):
+    busca = np.full(len(linhas), SEPARADOR_BUSCA, dtype=object)
+    for nome in _CAMPOS_BUSCA:
+        codigos, distintos = pd.factorize(linhas[nome])
+        normalizados = np.array([normalizar_busca(valor) for valor in distintos] + [''], dtype=object)
+        busca = busca + normalizados[codigos] + SEPARADOR_BUSCA
+    return busca
+
+
+def _diferentes(a, b):
+    return ~((a == b) | (pd.isna(a) & pd.isna(b)))
+
+
+# Armazém local (SQLite) das linhas de pedido com o status atual e o histórico
+# de transições de status. Cada carga grava só as linhas que mudaram (upsert
+# pela chave Nr.pedido + Produto) e registra em `transicoes` quando cada linha
+# entrou, mudou de status ou saiu da carteira. Uma conexão por operação, então
+# pode ser usado por várias threads; o modo WAL deixa as leituras das guias
+# correrem enquanto uma carga grava.
+class Armazem:
+    def __init__(self, caminho=None):
+        self.caminho = caminho or caminho_configurado()
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self.conectar() as con:
+            con.execute('PRAGMA journal_mode=WAL')
+            tabelas = {nome for nome, in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            # Armazéns anteriores à busca: cria e preenche a coluna `busca`
+            if 'itens' in tabelas and 'busca' not in {coluna[1] for coluna in con.execute('PRAGMA table_info(itens)')}:
+                con.execute('ALTER TABLE itens ADD COLUMN busca TEXT')
+                linhas = pd.read_sql_query(f"SELECT rowid, {', '.join(_CAMPOS_BUSCA)} FROM itens", con)
+                con.executemany('UPDATE itens SET busca = ? WHERE rowid = ?', zip(_coluna_busca(linhas), linhas['rowid'].tolist()))
+            con.executescript(ESQUEMA)
+            for nome, definicao in GATILHOS_BUSCA.items():
+                con.execute(f'CREATE TRIGGER IF NOT EXISTS {nome} {definicao}')
+            if 'itens_busca' not in tabelas:
+                con.execute("INSERT INTO itens_busca (itens_busca) VALUES ('rebuild')")
+
+    @contextlib.contextmanager
+    def conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # `df` é a carteira inteira: linhas do armazém que não estão nele saem
+    def sincronizar(self, df, agora):
+        with self.conectar() as con:
+            antigos = pd.read_sql_query(f"SELECT {', '.join(_NOMES)} FROM itens", con)
+            return self._gravar(con, _linhas(df), antigos, agora)
+
+    # `df` tem só as linhas que podem ter mudado; `removidas` (DataFrame com
+    # Nr.pedido e Produto) são linhas que podem ter saído da carteira
+    def atualizar(self, df, agora, removidas=None):
+        novos = _linhas(df)
+        chaves = novos[CHAVES]
+        if removidas is not None and len(removidas):
+            chaves = pd.concat([chaves, removidas[CHAVE_LINHA].astype(str).set_axis(CHAVES, axis=1)])
+        with self.conectar() as con:
+            con.execute('CREATE TEMP TABLE chaves (nr_pedido TEXT, produto TEXT)')
+            con.executemany('INSERT INTO temp.chaves VALUES (?, ?)', chaves.itertuples(index=False, name=None))
+            antigos = pd.read_sql_query(
+                f"SELECT DISTINCT {', '.join('itens.' + nome for nome in _NOMES)} "
+                f"FROM temp.chaves JOIN itens USING (nr_pedido, produto)", con)
+            return self._gravar(con, novos, antigos, agora)
+
+    def _gravar(self, con, novos, antigos, agora):
+        quando = agora.strftime(FORMATO_DATA)
+        # O merge externo ordena pelas chaves; `_ordem` devolve a ordem dos dados,
+        # que vira a ordem de inserção (rowid) das linhas novas
+        juntos = novos.assign(_ordem=np.arange(len(novos))).merge(
+            antigos, on=CHAVES, how='outer', suffixes=('', '_antigo'), indicator=True)
+        juntos = juntos.sort_values('_ordem', kind='stable', ignore_index=True)
+        inseridas = (juntos['_merge'] == 'left_only').to_numpy()
+        saiu = (juntos['_merge'] == 'right_only').to_numpy()
+        comuns = (juntos['_merge'] == 'both').to_numpy()
+
+        alteradas = np.zeros(len(juntos), dtype=bool)
+        for nome in _VALORES:
+            alteradas |= comuns & _diferentes(juntos[nome].to_numpy(), juntos[f'{nome}_antigo'].to_numpy())
+        mudou_status = comuns & _diferentes(juntos['status'].to_numpy(), juntos['status_antigo'].to_numpy())
+
+        gravar = juntos.loc[inseridas | alteradas, _NOMES]
+        gravar = gravar.assign(busca=_coluna_busca(gravar), atualizado_em=quando)
+        # Tudo na mesma transação: quem lê não vê o índice sem os gatilhos, e uma
+        # falha desfaz também o DROP TRIGGER. O sqlite3 não abre transação antes de
+        # DDL, então ela é aberta aqui (conectar faz o commit ou o rollback).
+        if not con.in_transaction:
+            con.execute('BEGIN')
+        em_massa = len(gravar) + saiu.sum() > LIMITE_GATILHOS
+        if em_massa:
+            for nome in GATILHOS_BUSCA:
+                con.execute(f'DROP TRIGGER {nome}')
+        con.executemany(_UPSERT, gravar.astype(object).where(gravar.notna(), None).itertuples(index=False, name=None))
+        con.executemany('DELETE FROM itens WHERE nr_pedido = ? AND produto = ?', juntos.loc[saiu, CHAVES].itertuples(index=False, name=None))
+        if em_massa:
+            con.execute("INSERT INTO itens_busca (itens_busca) VALUES ('rebuild')")
+            for nome, definicao in GATILHOS_BUSCA.items():
+                con.execute(f'CREATE TRIGGER {nome} {definicao}')
+
+        # Transições: entrada (de NULL), mudança de status e saída (para NULL)
+        transicoes = pd.concat([
+            pd.DataFrame({'nr_pedido': juntos['nr_pedido'], 'produto': juntos['produto'], 'de': None, 'para': juntos['status']})[inseridas],
+            pd.DataFrame({'nr_pedido': juntos['nr_pedido'], 'produto': juntos['produto'], 'de': juntos['status_antigo'], 'para': juntos['status']})[mudou_status],
+            pd.DataFrame({'nr_pedido': juntos['nr_pedido'], 'produto': juntos['produto'], 'de': juntos['status_antigo'], 'para': None})[saiu],
+        ]).assign(em=quando)
+        con.executemany(
+            'INSERT INTO transicoes (nr_pedido, produto, de, para, em) VALUES (?, ?, ?, ?, ?)',
+            transicoes.astype(object).where(transicoes.notna(), None).itertuples(index=False, name=None),
+        )
+        return {
+            'inseridas': int(inseridas.sum()),
+            'alteradas': int(alteradas.sum()),
+            'removidas': int(saiu.sum()),
+            'transicoes': len(transicoes),
+        }
+
+    # Transições de status de um pedido (e de um produto), da mais antiga à mais nova
+    def historico(self, nr_pedido, produto=None):
+        sql = 'SELECT nr_pedido, produto, de, para, em FROM transicoes WHERE nr_pedido = ?'
+        parametros = [nr_pedido]
+        if produto is not None:
+            sql += ' AND produto = ?'
+            parametros.append(produto)
+        with self.conectar() as con:
+            return pd.read_sql_query(sql + ' ORDER BY em, rowid', con, params=parametros, parse_dates=['em'])
+
+    # Últimas `limite` transições registradas
+    def ultimas_transicoes(self, limite=200):
+        with self.conectar() as con:
+            return pd.read_sql_query(
+                'SELECT nr_pedido, produto, de, para, em FROM transicoes ORDER BY em DESC, rowid DESC LIMIT ?',
+                con, params=[limite], parse_dates=['em'])
+
+    # Tempo até a entrega das linhas que o armazém viu entrar em aberto e depois
+    # virar 'Entregue': dias pelo histórico (entrada -> Entregue) e pelas datas
+    # do ERP (Dt.pedido -> Dt.fat.) de quem ainda está na carteira
+    def tempos_de_entrega(self):
+        with self.conectar() as con:
+            tempos = pd.read_sql_query("""
+                SELECT t.nr_pedido, t.produto,
+                       MIN(CASE WHEN t.de IS NULL AND t.para <> 'Entregue' THEN t.em END) AS entrou_em,
+                       MIN(CASE WHEN t.para = 'Atrasado' THEN t.em END) AS atrasou_em,
+                       MIN(CASE WHEN t.para = 'Entregue' THEN t.em END) AS entregue_em,
+                       i.dt_pedido, i.dt_fat
+                FROM transicoes t LEFT JOIN itens i USING (nr_pedido, produto)
+                GROUP BY t.nr_pedido, t.produto
+                HAVING entrou_em IS NOT NULL AND entregue_em IS NOT NULL
+            """, con, parse_dates=['entrou_em', 'atrasou_em', 'entregue_em', 'dt_pedido', 'dt_fat'])
+        tempos['dias'] = (tempos['entregue_em'] - tempos['entrou_em']).dt.total_seconds() / 86400
+        tempos['dias_erp'] = (tempos['dt_fat'] - tempos['dt_pedido']).dt.days
+        return tempos
+
+
+# Armazém do painel, aberto só quando pedido: PEDIDOS_ARMAZEM definido ou
+# `necessario` (backend sqlite). Sem permissão de escrita no diretório o painel
+# segue sem ele (None), como segue sem o cache colunar da ingestão.
+def abrir_configurado(necessario=False):
+    if not (necessario or VARIAVEL_ARMAZEM in os.environ):
+        return None
+    try:
+        return Armazem()
+    except (OSError, sqlite3.Error) as e:
+        log.warning('armazém %s indisponível: %s', caminho_configurado(), e)
+        return None
@@ -0,0 +1,266 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from pedidos.agregados import contar_modelos, dimensao_produtos, montar_cubo
+from pedidos.compactacao import concatenar_compactos
+from pedidos.desempenho import Medicao
+from pedidos.ingestao import CHAVE_LINHA, DIR_PLANILHAS, PADRAO_PLANILHA, ler_planilhas
+from pedidos.preparo import preparar_pedidos
+from pedidos.setores import SETORES
+from pedidos.status import CLIENTES_PEDIDO_DESDOBRADO, STATUS, FilaPrazos, separar_pedido
+
+log = logging.getLogger(__name__)
+
+# Espera depois do último evento do sistema de arquivos antes de reler a planilha,
+# para não pegar o arquivo no meio da cópia
+ESPERA_EVENTOS = 2.0
+
+
+def _chaves(df):
+    return pd.MultiIndex.from_arrays([df[coluna].astype(str) for coluna in CHAVE_LINHA])
+
+
+def _valores_diferentes(antigos, novos):
+    diferente = np.zeros(len(novos), dtype=bool)
+    for coluna in novos.columns:
+        a = antigos[coluna].to_numpy()
+        b = novos[coluna].to_numpy()
+        diferente |= ~((a == b) | (pd.isna(a) & pd.isna(b)))
+    return diferente
+
+
+# Compara duas versões brutas da planilha pela chave (Nr.pedido, Produto).
+# Devolve máscaras sobre `novo` (inseridas, alteradas), máscara sobre `antigo`
+# (removidas) e, para cada linha de `antigo`, sua posição em `novo` (-1 se saiu).
+# Devolve None quando a comparação linha a linha não é possível (colunas
+# diferentes ou chave repetida) e a planilha precisa ser preparada inteira.
+def diferenca_linhas(antigo, novo):
+    if list(antigo.columns) != list(novo.columns):
+        return None
+    chaves_antigo, chaves_novo = _chaves(antigo), _chaves(novo)
+    if not (chaves_antigo.is_unique and chaves_novo.is_unique):
+        return None
+
+    posicao_no_antigo = chaves_antigo.get_indexer(chaves_novo)
+    posicao_no_novo = chaves_novo.get_indexer(chaves_antigo)
+    inseridas = posicao_no_antigo == -1
+
+    alteradas = np.zeros(len(novo), dtype=bool)
+    comuns = ~inseridas
+    alteradas[comuns] = _valores_diferentes(antigo.iloc[posicao_no_antigo[comuns]], novo[comuns])
+    return inseridas, alteradas, posicao_no_novo == -1, posicao_no_novo
+
+
+def _indicadores(df):
+    return {
+        'status': df['Status'].value_counts().reindex(STATUS, fill_value=0),
+        'setor_status': df.groupby(['Setor', 'Status'], observed=False).size(),
+        'itens_por_pedido': df['Ped. Cliente'].value_counts(),
+        'cubo': montar_cubo(df),
+        'modelos': contar_modelos(df),
+    }
+
+
+def _combinar_indicadores(indicadores, removidos, adicionados):
+    combinado = {}
+    saem, entram = _indicadores(removidos), _indicadores(adicionados)
+    for nome, atual in indicadores.items():
+        novo = atual.sub(saem[nome], fill_value=0).add(entram[nome], fill_value=0)
+        # Grupos que ficaram sem itens saem do resultado
+        if nome in ('itens_por_pedido', 'modelos'):
+            novo = novo[novo != 0]
+        elif nome == 'cubo':
+            novo = novo[novo['itens'] != 0]
+        combinado[nome] = novo
+    return combinado
+
+
+# Mantém o DataFrame preparado de todas as exportações de `planilha/` (a mais
+# nova vale para cada linha) e o atualiza quando o ERP grava uma planilha. Só as
+# linhas inseridas, alteradas ou removidas (e os outros itens dos pedidos
+# desdobrados que elas tocam) passam de novo por preparar_pedidos; o resto é
+# reaproveitado. Contadores e cubo de agregados são ajustados pela diferença.
+# Cada mudança incrementa `versao`, que os caches do painel usam como chave. Com
+# um `armazem` (pedidos.armazem), as mesmas linhas que mudaram são gravadas nele,
+# com as transições de status.
+class ServicoIngestao:
+    def __init__(self, diretorio=DIR_PLANILHAS, clientes_desdobrados=CLIENTES_PEDIDO_DESDOBRADO, armazem=None):
+        self.diretorio = diretorio
+        self.clientes_desdobrados = clientes_desdobrados
+        self.armazem = armazem
+        self.versao = 0
+        self.relatorio = []
+        self._bruto = None
+        self._preparado = None
+        self._indicadores = None
+        self._prazos = None
+        # Tempos da última carga que mudou os dados (leitura, total, o que mudou e
+        # as etapas, com os passos de preparar_pedidos)
+        self.ultima_carga = None
+        self._trava = threading.Lock()
+        self._trava_carga = threading.Lock()
+        self._observador = None
+        self._temporizador = None
+
+    def carregar(self, agora=None):
+        with self._trava_carga:
+            agora = agora or datetime.now()
+            # Etapas da carga, com os passos de preparar_pedidos, para o painel de desempenho
+            medicao = Medicao(True)
+            inicio = time.perf_counter()
+            with medicao.etapa('ler_planilhas') as registro:
+                bruto, relatorio = ler_planilhas(self.diretorio)
+                registro['linhas'] = len(bruto)
+            leitura = time.perf_counter() - inicio
+            # dados() troca _preparado e _indicadores a cada minuto que vence prazos:
+            # a carga trabalha sobre uma única leitura dos dois. O que vencer depois
+            # dela volta a vencer na fila nova, feita a partir do resultado.
+            with self._trava:
+                bruto_atual, preparado_atual, indicadores_atuais = self._bruto, self._preparado, self._indicadores
+            with medicao.etapa('diferenca_linhas', len(bruto)):
+                diferenca = None if bruto_atual is None else diferenca_linhas(bruto_atual, bruto)
+
+            if diferenca is None:
+                with medicao.etapa('preparar_pedidos', len(bruto)):
+                    preparado = preparar_pedidos(bruto, agora, self.clientes_desdobrados, medicao)
+                with medicao.etapa('indicadores', len(preparado)):
+                    indicadores = _indicadores(preparado)
+                descricao = f"{len(preparado)} linhas preparadas"
+                if self.armazem is not None:
+                    with medicao.etapa('armazem', len(preparado)):
+                        self.armazem.sincronizar(preparado, agora)
+            else:
+                inseridas, alteradas, removidas, posicao_no_novo = diferenca
+                if not (inseridas.any() or alteradas.any() or removidas.any()):
+                    self.relatorio = relatorio
+                    return False
+                recalcular = self._linhas_a_recalcular(bruto_atual, bruto, inseridas | alteradas, removidas)
+                # Posições (na versão antiga) das linhas preparadas que saem ou serão refeitas
+                em_novo = ~removidas
+                descartar = removidas.copy()
+                descartar[em_novo] = recalcular[posicao_no_novo[em_novo]]
+                descartar = np.flatnonzero(descartar)
+
+                antigos = preparado_atual[preparado_atual.index.isin(descartar)]
+                mantidos = preparado_atual[~preparado_atual.index.isin(descartar)].copy()
+                mantidos.index = posicao_no_novo[mantidos.index]
+                with medicao.etapa('preparar_pedidos', int(recalcular.sum())):
+                    novos = preparar_pedidos(bruto[recalcular], agora, self.clientes_desdobrados, medicao)
+                preparado = concatenar_compactos([mantidos, novos]).sort_index()
+                with medicao.etapa('indicadores', len(novos)):
+                    indicadores = _combinar_indicadores(indicadores_atuais, antigos, novos)
+                descricao = (f"{inseridas.sum()} inseridas, {alteradas.sum()} alteradas, "
+                             f"{removidas.sum()} removidas, {len(novos)} linhas preparadas")
+                if self.armazem is not None:
+                    with medicao.etapa('armazem', len(novos)):
+                        self.armazem.atualizar(novos, agora, removidas=antigos)
+
+            with medicao.etapa('fila_prazos', len(preparado)):
+                prazos = FilaPrazos(preparado, self.clientes_desdobrados)
+            with self._trava:
+                self._bruto, self._preparado, self._indicadores = bruto, preparado, indicadores
+                self._prazos = prazos
+                self.relatorio = relatorio
+                self.versao += 1
+                self.ultima_carga = {
+                    'versao': self.versao,
+                    'leitura_ms': round(leitura * 1000, 1),
+                    'total_ms': round((time.perf_counter() - inicio) * 1000, 1),
+                    'descricao': descricao,
+                    'etapas': medicao.etapas,
+                }
+            log.info('%s -> versão %d: %s em %.1f ms', self.diretorio, self.versao, descricao, self.ultima_carga['total_ms'])
+            return True
+
+    def _linhas_a_recalcular(self, bruto_atual, bruto, mudaram, removidas):
+        # O status de um pedido desdobrado depende dos outros desdobramentos do
+        # mesmo pedido base, então todos eles são preparados de novo juntos
+        nr_tocados = pd.concat([bruto.loc[mudaram, 'Nr.pedido'], bruto_atual.loc[removidas, 'Nr.pedido']])
+        bases = separar_pedido(nr_tocados)['base'].unique()
+        da_regra = bruto['Fantasia'].isin(self.clientes_desdobrados).to_numpy()
+        recalcular = mudaram.copy()
+        recalcular[da_regra] |= separar_pedido(bruto.loc[da_regra, 'Nr.pedido'])['base'].isin(bases).to_numpy()
+        return recalcular
+
+    # Devolve (versão, DataFrame preparado, indicadores) com o status 'Atrasado'
+    # avaliado em `agora`; a versão é lida junto com os dados, sob a mesma trava.
+    # Os indicadores são: itens por status, itens por setor e status, total de
+    # itens, total de pedidos (Ped. Cliente distintos), o cubo de agregados
+    # (pedidos.agregados) com as dimensões como colunas e a dimensão de produtos
+    # (Produto -> Modelo canônico).
+    def dados(self, agora):
+        with self._trava:
+            preparado, indicadores = self._preparado, self._indicadores
+            # Só as linhas que venceram desde a última chamada mudam (FilaPrazos);
+            # a cópia é rasa e só a coluna Status é refeita
+            vencidas = self._prazos.vencer(agora)
+            if len(vencidas):
+                antes = preparado.iloc[vencidas]
+                status = preparado['Status'].copy()
+                status.iloc[vencidas] = 'Atrasado'
+                preparado = preparado.copy(deep=False)
+                preparado['Status'] = status
+                indicadores = _combinar_indicadores(indicadores, antes, preparado.iloc[vencidas])
+                self._preparado, self._indicadores = preparado, indicadores
+                if self.armazem is not None:
+                    self.armazem.atualizar(preparado.iloc[vencidas], agora)
+            versao = self.versao
+        return versao, preparado, {
+            'status': indicadores['status'].astype(int).to_dict(),
+            'setor': {
+                setor: indicadores['setor_status'].reindex(pd.MultiIndex.from_product([[setor], STATUS]), fill_value=0).droplevel(0).astype(int).to_dict()
+                for setor in SETORES
+            },
+            'total_itens': len(preparado),
+            'total_pedidos': len(indicadores['itens_por_pedido']),
+            'cubo': indicadores['cubo'].reset_index(),
+            'produtos': dimensao_produtos(indicadores['modelos']),
+        }
+
+    def iniciar(self):
+        if self._preparado is None:
+            self.carregar()
+        if self._observador is None:
+            self._observador = Observer()
+            self._observador.schedule(_EventosPlanilha(self), self.diretorio, recursive=False)
+            self._observador.start()
+
+    def parar(self):
+        if self._observador is not None:
+            self._observador.stop()
+            self._observador.join()
+            self._observador = None
+
+    def _agendar_recarga(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+        self._temporizador = threading.Timer(ESPERA_EVENTOS, self._recarregar)
+        self._temporizador.daemon = True
+        self._temporizador.start()
+
+    def _recarregar(self):
+        try:
+            self.carregar()
+        except Exception as e:
+            # Arquivo ainda incompleto ou inválido: mantém os dados atuais e espera o próximo evento
+            log.warning('falha ao recarregar %s: %s', self.diretorio, e)
+
+
+class _EventosPlanilha(FileSystemEventHandler):
+    def __init__(self, servico):
+        self.servico = servico
+
+    def on_any_event(self, event):
+        caminhos = [getattr(event, 'src_path', ''), getattr(event, 'dest_path', '')]
+        if event.event_type in ('created', 'modified', 'moved', 'deleted') and any(
+            PADRAO_PLANILHA.match(os.path.basename(caminho)) for caminho in caminhos if caminho
+        ):
+            self.servico._agendar_recarga()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# Tipos compactos dos dados preparados: categorias para textos que se repetem
+# muito, strings Arrow para as chaves de alta cardinalidade e float32 para
+# quantidades. Valores em R$ continuam float64 para não perder centavos.
+ESQUEMA_COMPACTO = {
+    'Nr.pedido': 'string[pyarrow]',
+    'Ped. Cliente': 'string[pyarrow]',
+    'Fantasia': 'category',
+    'UN': 'category',
+    'Produto': 'category',
+    'Modelo': 'category',
+    'Qtd.': 'float32',
+}
+
+
+def compactar(df):
+    tipos = {coluna: tipo for coluna, tipo in ESQUEMA_COMPACTO.items() if coluna in df.columns}
+    compacto = df.astype(tipos)
+    # Inteiros que sobraram vão para o menor tipo que comporta os valores
+    for coluna in compacto.select_dtypes(include='integer').columns:
+        compacto[coluna] = pd.to_numeric(compacto[coluna], downcast='integer')
+    return compacto
+
+
+# Concatena DataFrames compactos mantendo as colunas categóricas como categoria:
+# quando as categorias diferem, todos passam a usar a união (ordenada)
+def concatenar_compactos(quadros):
+    quadros = list(quadros)
+    for coluna in quadros[0].columns:
+        tipos = [quadro[coluna].dtype for quadro in quadros]
+        if not all(isinstance(tipo, pd.CategoricalDtype) for tipo in tipos):
+            continue
+        if all(tipo.categories.equals(tipos[0].categories) for tipo in tipos):
+            continue
+        categorias = sorted(set().union(*(tipo.categories for tipo in tipos)))
+        quadros = [quadro.assign(**{coluna: quadro[coluna].cat.set_categories(categorias)}) for quadro in quadros]
+    return pd.concat(quadros)
+
+
+# Tipo "natural" de uma coluna compacta: texto como objeto Python, números em 64 bits
+def _expandida(serie):
+    if isinstance(serie.dtype, (pd.CategoricalDtype, pd.StringDtype)):
+        return serie.astype(object)
+    if pd.api.types.is_float_dtype(serie.dtype):
+        return serie.astype(np.float64)
+    if pd.api.types.is_integer_dtype(serie.dtype):
+        return serie.astype(np.int64)
+    return serie
+
+
+# Bytes por coluna com os tipos naturais (antes) e com os tipos compactos (depois)
+def relatorio_memoria(df):
+    linhas = []
+    for coluna in df.columns:
+        linhas.append({
+            'Coluna': coluna,
+            'Tipo': str(df[coluna].dtype),
+            'Bytes antes': int(_expandida(df[coluna]).memory_usage(index=False, deep=True)),
+            'Bytes depois': int(df[coluna].memory_usage(index=False, deep=True)),
+        })
+    relatorio = pd.DataFrame(linhas)
+    total = pd.DataFrame([{
+        'Coluna': 'Total', 'Tipo': '',
+        'Bytes antes': relatorio['Bytes antes'].sum(), 'Bytes depois': relatorio['Bytes depois'].sum(),
+    }])
+    relatorio = pd.concat([relatorio, total], ignore_index=True)
+    relatorio['Redução'] = 100 * (1 - relatorio['Bytes depois'] / relatorio['Bytes antes'])
+    return relatorio
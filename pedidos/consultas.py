@@ -0,0 +1,275 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from pedidos.armazem import COLUNAS, DATAS, SEPARADOR_BUSCA
+from pedidos.indices import COMECO, TRECHO, VALOR_IGUAL, IndiceBusca, normalizar_busca
+from pedidos.setores import SETORES
+from pedidos.status import STATUS
+
+# Backend das consultas das guias (filtros, totais, contagens e páginas da
+# tabela): 'pandas' (padrão, índices de pedidos.indices + DataFrame), 'arrow'
+# (tabela Arrow + kernels do pyarrow.compute, sem voltar ao pandas) ou 'sqlite'
+# (consultas SQL no armazém de pedidos.armazem, sem o DataFrame)
+VARIAVEL_BACKEND = 'PEDIDOS_BACKEND'
+BACKENDS = ('pandas', 'arrow', 'sqlite')
+
+
+def backend_configurado():
+    backend = os.environ.get(VARIAVEL_BACKEND, 'pandas').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"{VARIAVEL_BACKEND}={backend!r}: use um de {', '.join(BACKENDS)}")
+    return backend
+
+
+def _lista(valor):
+    return [valor] if isinstance(valor, str) else list(valor)
+
+
+# Texto da busca das guias; só espaços = sem busca
+def _busca(texto):
+    return (texto or '').strip()
+
+
+# Consultas sobre o DataFrame preparado usando os índices (IndiceFiltros).
+# Posições são sempre posições de linha no DataFrame inteiro, em ordem crescente
+# ou, com `busca` (pedidos.indices.IndiceBusca), por relevância.
+class ConsultasPandas:
+    nome = 'pandas'
+
+    def __init__(self, df, indice):
+        self.df = df
+        self.indice = indice
+
+    def filtrar(self, cliente=None, setor=None, status=None, busca=None):
+        posicoes = self.indice.posicoes(cliente=cliente, setor=setor, status=status, busca=_busca(busca))
+        return np.arange(len(self.df)) if posicoes is None else posicoes
+
+    def valores(self, coluna, posicoes):
+        return self.df[coluna].iloc[posicoes].dropna().unique().tolist()
+
+    def colunas_preenchidas(self, posicoes):
+        return self.df.columns[self.df.iloc[posicoes].notna().any()].tolist()
+
+    def somar(self, coluna, posicoes):
+        return float(self.df[coluna].iloc[posicoes].sum())
+
+    # Itens e valor total por status das linhas em `posicoes`
+    def por_status(self, posicoes):
+        linhas = self.df.iloc[posicoes]
+        grupos = linhas.groupby('Status', observed=True)['Valor Total'].agg(['size', 'sum'])
+        return {status: (int(itens), float(valor)) for status, (itens, valor) in grupos.iterrows()}
+
+    # Linhas [inicio, fim) de `posicoes` na ordem pedida (estável, nulos no fim)
+    def pagina(self, posicoes, colunas, ordenar_por, crescente, inicio, fim):
+        if ordenar_por is not None:
+            valores = self.df[ordenar_por].iloc[posicoes].reset_index(drop=True)
+            ordem = valores.sort_values(ascending=crescente, na_position='last', kind='stable').index.to_numpy()
+            posicoes = posicoes[ordem]
+        return self.df.iloc[posicoes[inicio:fim]][colunas]
+
+
+# As mesmas consultas sobre uma tabela Arrow (pa.Table.from_pandas do DataFrame
+# preparado): filtros, somas, contagens e ordenação com pyarrow.compute, e a
+# página vai para o st.dataframe como tabela Arrow. A busca usa o mesmo
+# IndiceBusca do backend pandas.
+class ConsultasArrow:
+    nome = 'arrow'
+
+    def __init__(self, tabela, busca):
+        self.tabela = tabela.combine_chunks()
+        self.busca = busca
+
+    @classmethod
+    def de_dataframe(cls, df, busca=None):
+        return cls(pa.Table.from_pandas(df, preserve_index=False), busca or IndiceBusca(df))
+
+    # Mesma tabela com outra coluna Status (o 'Atrasado' muda com o tempo);
+    # as outras colunas são reaproveitadas sem cópia
+    def com_status(self, status):
+        posicao = self.tabela.column_names.index('Status')
+        return ConsultasArrow(self.tabela.set_column(posicao, 'Status', pa.array(status)), self.busca)
+
+    def filtrar(self, cliente=None, setor=None, status=None, busca=None):
+        mascara = None
+        condicoes = []
+        if cliente is not None:
+            condicoes.append(pc.is_in(self.tabela['Fantasia'], value_set=pa.array([cliente])))
+        if setor is not None:
+            condicoes.append(pc.is_in(self.tabela['Setor'], value_set=pa.array([setor])))
+        if status is not None:
+            condicoes.append(pc.is_in(self.tabela['Status'], value_set=pa.array(_lista(status))))
+        for condicao in condicoes:
+            mascara = condicao if mascara is None else pc.and_(mascara, condicao)
+        busca = _busca(busca)
+        if busca:
+            # Mantém a ordem por relevância da busca
+            ranqueados = self.busca.buscar(busca)
+            if mascara is None:
+                return ranqueados
+            return ranqueados[pc.fill_null(mascara, False).to_numpy(zero_copy_only=False)[ranqueados]]
+        if mascara is None:
+            return np.arange(self.tabela.num_rows)
+        return pc.indices_nonzero(mascara).to_numpy().astype(np.intp)
+
+    # Valores de uma coluna nas linhas de `posicoes`. Todas as linhas dispensam o
+    # take se a ordem não importa (agregações) ou se já estão na ordem da tabela;
+    # a busca devolve todas as linhas, mas por relevância
+    def _coluna(self, nome, posicoes, qualquer_ordem=False):
+        coluna = self.tabela[nome]
+        if len(posicoes) == self.tabela.num_rows and (qualquer_ordem or bool(np.all(posicoes[1:] > posicoes[:-1]))):
+            return coluna
+        return coluna.take(pa.array(posicoes, type=pa.int64()))
+
+    def valores(self, coluna, posicoes):
+        valores = pc.unique(pc.drop_null(self._coluna(coluna, posicoes, True)))
+        if pa.types.is_dictionary(valores.type):
+            valores = valores.dictionary_decode()
+        return valores.to_pylist()
+
+    # Colunas sem nulos na tabela inteira não precisam ser conferidas
+    def colunas_preenchidas(self, posicoes):
+        if len(posicoes) == 0:
+            return []
+        return [nome for nome, coluna in zip(self.tabela.column_names, self.tabela.columns)
+                if coluna.null_count == 0 or self._coluna(nome, posicoes, True).null_count < len(posicoes)]
+
+    def somar(self, coluna, posicoes):
+        return float(pc.sum(self._coluna(coluna, posicoes, True)).as_py() or 0.0)
+
+    def por_status(self, posicoes):
+        linhas = pa.table({'Status': self._coluna('Status', posicoes, True), 'Valor Total': self._coluna('Valor Total', posicoes, True)})
+        grupos = linhas.group_by('Status').aggregate(
+            [('Valor Total', 'count', pc.CountOptions(mode='all')), ('Valor Total', 'sum')])
+        status = grupos['Status'].cast(pa.string()).to_pylist()
+        return {s: (int(n), float(v)) for s, n, v in zip(status, grupos['Valor Total_count'].to_pylist(), grupos['Valor Total_sum'].to_pylist())}
+
+    # Ordena só a coluna escolhida e busca na tabela apenas as linhas da página
+    def pagina(self, posicoes, colunas, ordenar_por, crescente, inicio, fim):
+        if ordenar_por is not None:
+            chave = self._coluna(ordenar_por, posicoes).combine_chunks()
+            # Categorias ordenam pela posição na categoria, como no pandas
+            if pa.types.is_dictionary(chave.type):
+                chave = chave.indices
+            ordem = pc.sort_indices(chave, sort_keys=[('', 'ascending' if crescente else 'descending')], null_placement='at_end')
+            posicoes = posicoes[ordem.to_numpy()]
+        return self.tabela.select(colunas).take(pa.array(posicoes[inicio:fim], type=pa.int64()))
+
+
+# Seleção do backend SQLite: em vez de posições, a condição WHERE que a produziu
+# (as consultas seguintes a reaplicam no banco), o número de linhas e a ordem
+# natural da seleção (por relevância quando há busca)
+class Selecao:
+    def __init__(self, onde, parametros, total, ordem='rowid', parametros_ordem=()):
+        self.onde = onde
+        self.parametros = parametros
+        self.total = total
+        self.ordem = ordem
+        self.parametros_ordem = list(parametros_ordem)
+
+    def __len__(self):
+        return self.total
+
+
+# Colunas categóricas com ordem própria (não alfabética) nas páginas do sqlite
+ORDEM_CATEGORIAS = {'Status': STATUS, 'Setor': SETORES}
+
+
+# As mesmas consultas direto no armazém SQLite: os filtros viram condições
+# sobre as colunas indexadas e só a página volta como DataFrame. A busca usa a
+# coluna normalizada `busca` (campos separados por SEPARADOR_BUSCA) e o índice
+# de trigramas `itens_busca`; o tipo de acerto sai da posição do texto entre
+# os separadores. Empates na ordenação seguem a ordem natural da seleção
+# (relevância da busca e depois a ordem de inserção, rowid), como no pandas.
+class ConsultasSQLite:
+    nome = 'sqlite'
+
+    def __init__(self, armazem):
+        self.armazem = armazem
+
+    def _consultar(self, sql, parametros=()):
+        with self.armazem.conectar() as con:
+            return con.execute(sql, parametros).fetchall()
+
+    def filtrar(self, cliente=None, setor=None, status=None, busca=None):
+        condicoes, parametros = [], []
+        ordem, parametros_ordem = 'rowid', []
+        if cliente is not None:
+            condicoes.append('fantasia = ?')
+            parametros.append(cliente)
+        if setor is not None:
+            condicoes.append('setor = ?')
+            parametros.append(setor)
+        if status is not None:
+            status = _lista(status)
+            condicoes.append(f"status IN ({', '.join('?' * len(status))})")
+            parametros += status
+        termos = normalizar_busca(_busca(busca)).split()
+        if termos:
+            # O índice de trigramas só responde a palavras de 3 caracteres ou mais;
+            # as frases entre aspas de um MATCH precisam aparecer todas
+            longos = [termo for termo in termos if len(termo) >= 3]
+            if longos:
+                condicoes.append('rowid IN (SELECT rowid FROM itens_busca WHERE itens_busca MATCH ?)')
+                parametros.append(' '.join('"' + termo.replace('"', '""') + '"' for termo in longos))
+            for termo in termos:
+                if len(termo) < 3:
+                    condicoes.append('instr(busca, ?) > 0')
+                    parametros.append(termo)
+            acertos = [f'CASE WHEN instr(busca, ?) > 0 THEN {VALOR_IGUAL} WHEN instr(busca, ?) > 0 THEN {COMECO} ELSE {TRECHO} END'] * len(termos)
+            # max() com um argumento só seria a agregação do SQLite
+            ordem = (f"max({', '.join(acertos)})" if len(acertos) > 1 else acertos[0]) + ', rowid'
+            for termo in termos:
+                parametros_ordem += [SEPARADOR_BUSCA + termo + SEPARADOR_BUSCA, SEPARADOR_BUSCA + termo]
+        onde = ' AND '.join(condicoes) or '1'
+        total = self._consultar(f'SELECT COUNT(*) FROM itens WHERE {onde}', parametros)[0][0]
+        return Selecao(onde, parametros, total, ordem, parametros_ordem)
+
+    def valores(self, coluna, selecao):
+        nome = COLUNAS[coluna]
+        linhas = self._consultar(
+            f'SELECT {nome} FROM itens WHERE ({selecao.onde}) AND {nome} IS NOT NULL GROUP BY {nome} ORDER BY MIN(rowid)',
+            selecao.parametros)
+        return [valor for valor, in linhas]
+
+    def colunas_preenchidas(self, selecao):
+        if not selecao.total:
+            return []
+        contagens = self._consultar(
+            f"SELECT {', '.join(f'COUNT({nome})' for nome in COLUNAS.values())} FROM itens WHERE {selecao.onde}",
+            selecao.parametros)[0]
+        return [coluna for coluna, contagem in zip(COLUNAS, contagens) if contagem]
+
+    def somar(self, coluna, selecao):
+        return float(self._consultar(f'SELECT TOTAL({COLUNAS[coluna]}) FROM itens WHERE {selecao.onde}', selecao.parametros)[0][0])
+
+    def por_status(self, selecao):
+        linhas = self._consultar(
+            f'SELECT status, COUNT(*), TOTAL(valor_total) FROM itens WHERE {selecao.onde} GROUP BY status',
+            selecao.parametros)
+        return {status: (int(itens), float(valor)) for status, itens, valor in linhas}
+
+    def pagina(self, selecao, colunas, ordenar_por, crescente, inicio, fim):
+        ordem, parametros_ordem = selecao.ordem, selecao.parametros_ordem
+        if ordenar_por is not None:
+            chave, parametros_chave = COLUNAS[ordenar_por], []
+            # Status e Setor ordenam pela ordem das categorias, como no pandas e no arrow
+            if ordenar_por in ORDEM_CATEGORIAS:
+                categorias = ORDEM_CATEGORIAS[ordenar_por]
+                chave = f"CASE {chave} {' '.join(f'WHEN ? THEN {i}' for i in range(len(categorias)))} END"
+                parametros_chave = list(categorias)
+            ordem = f"{chave} {'ASC' if crescente else 'DESC'} NULLS LAST, {ordem}"
+            parametros_ordem = parametros_chave + parametros_ordem
+        with self.armazem.conectar() as con:
+            tabela = pd.read_sql_query(
+                f"SELECT {', '.join(COLUNAS[coluna] for coluna in colunas)} FROM itens "
+                f"WHERE {selecao.onde} ORDER BY {ordem} LIMIT ? OFFSET ?",
+                con, params=selecao.parametros + parametros_ordem + [max(0, fim - inicio), inicio])
+        tabela.columns = colunas
+        for coluna in DATAS:
+            if coluna in tabela:
+                tabela[coluna] = pd.to_datetime(tabela[coluna])
+        return tabela
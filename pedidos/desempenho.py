@@ -0,0 +1,63 @@
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Variável de ambiente com o caminho de um arquivo JSON Lines: quando definida,
+# cada execução do painel é medida e anexada ao arquivo
+VARIAVEL_LOG = 'PEDIDOS_LOG_DESEMPENHO'
+
+
+# Tempos e linhas das etapas de uma execução (rerun) do painel. Desativada, as
+# etapas são um contexto vazio e as funções decoradas ficam como estão, então o
+# custo é só o de uma chamada.
+class Medicao:
+    def __init__(self, ativa):
+        self.ativa = ativa
+        self.etapas = []
+        self._nivel = 0
+        self._inicio = time.perf_counter()
+
+    # with medicao.etapa('nome', linhas) as registro: ... (registro['linhas'] pode
+    # ser preenchido dentro do bloco, quando só se sabe no fim)
+    def etapa(self, nome, linhas=None):
+        if not self.ativa:
+            return nullcontext({})
+        return self._cronometrar(nome, linhas)
+
+    @contextmanager
+    def _cronometrar(self, nome, linhas):
+        registro = {'etapa': nome, 'nivel': self._nivel, 'ms': None, 'linhas': linhas}
+        self.etapas.append(registro)
+        self._nivel += 1
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro['ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+            self._nivel -= 1
+
+    # Decorador: cada chamada da função vira uma etapa com o nome dela
+    def cronometrada(self, funcao):
+        if not self.ativa:
+            return funcao
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with self._cronometrar(funcao.__name__, None):
+                return funcao(*args, **kwargs)
+        return medida
+
+    def registro(self, **contexto):
+        return {
+            'quando': datetime.now().isoformat(timespec='seconds'),
+            **contexto,
+            'total_ms': round((time.perf_counter() - self._inicio) * 1000, 2),
+            'etapas': self.etapas,
+        }
+
+
+def anexar_log(registro, caminho):
+    with open(caminho, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
@@ -0,0 +1,96 @@
+import plotly.express as px
+import plotly.io as pio
+
+from pedidos.agregados import somar_cubo, top_n_com_outros
+
+# Quantos produtos aparecem no gráfico "Total por Referência"; o resto vira "Outros"
+TOP_PRODUTOS = 30
+# Tamanho máximo (bytes do JSON) de uma figura enviada ao navegador
+LIMITE_BYTES_FIGURA = 100_000
+
+# Os gráficos do Dashboard leem o cubo de agregados (uma linha por grupo), não os itens
+def create_value_bar_chart2(cubo, produtos, Produto, Modelo, top=TOP_PRODUTOS):
+    # Frequência dos produtos mais pedidos, calculada no servidor a partir do cubo
+    frequencia, agrupados = top_n_com_outros(somar_cubo(cubo, Produto)['itens'], top)
+    contagem = frequencia.rename_axis(Produto).reset_index(name='Frequência')
+
+    # Modelo canônico de cada produto (dimensão de produtos) para o hover
+    contagem[Modelo] = contagem[Produto].map(produtos)
+    if agrupados:
+        contagem.loc[contagem.index[-1], Modelo] = f"{agrupados} outros produtos"
+
+    # Criar o gráfico de barras interativo com hover data
+    bar_chart2 = px.bar(
+        contagem, 
+        x=Produto, 
+        y='Frequência', 
+        title='Total por Referência',
+        labels={Produto: 'Código', 'Frequência': 'Quantidade'},
+        color='Frequência', 
+        color_continuous_scale='Viridis',
+        hover_data={Produto: True, 'Frequência': True, Modelo: True}  # Incluir o Modelo no hover
+    )
+
+    # Customizações adicionais
+    bar_chart2.update_layout(
+        xaxis_title='Código do Produto',
+        yaxis_title='Número de Pedidos',
+        xaxis_tickangle=-45,
+        bargap=0.2,  # Ajuste do espaçamento entre as barras
+        xaxis=dict(type='category')  # Códigos numéricos continuam como rótulos
+    )
+
+    # Retornar o gráfico
+    return bar_chart2
+
+# Criação de gráficos
+def create_percentage_chart(por_status):
+    # Total de itens por status
+    total_pedidos = por_status['itens'].sort_values(ascending=False)
+    
+    # Calculando a porcentagem
+    total = total_pedidos.sum()
+    percentage = (total_pedidos / total) * 100
+    
+    percentage_summary = percentage.reset_index()
+    percentage_summary.columns = ['Status', 'Percentual']
+    
+    # Gráfico de pizza para mostrar a porcentagem
+    pie_chart = px.pie(percentage_summary, 
+                       values='Percentual', 
+                       names='Status', 
+                       title='Porcentagem de Pedidos por Status')
+
+    return pie_chart
+
+# Função para criar o gráfico de barras com o valor total em R$ apenas para status Pendente e Atrasado
+def create_value_bar_chart(por_status):
+    # Valor total em R$ dos status "Pendente", "Atrasado" e "Entregue"
+    total_por_status = por_status.loc[por_status.index.isin(['Pendente', 'Atrasado', 'Entregue']), 'valor'].reset_index()
+    total_por_status.columns = ['Status', 'Valor Total']
+
+    # Cria o gráfico de barras
+    bar_chart = px.bar(
+        total_por_status, 
+        x='Status', 
+        y='Valor Total', 
+        text='Valor Total', 
+        title='Valor Total por Status',
+        labels={'Valor Total': 'Valor Total (R$)', 'Status': '  '}
+    )
+    bar_chart.update_traces(texttemplate='R$ %{y:,.2f}')
+    bar_chart.update_layout(separators=',.')  # decimal com vírgula, milhar com ponto
+    
+    return bar_chart
+
+
+# Monta a figura com `criar` e devolve (figura, bytes do JSON). Gráficos com
+# grupos (`grupos`, como os produtos do "Total por Referência") são refeitos com
+# metade dos grupos, e o resto em "Outros", até o JSON caber em `limite` bytes
+def figura_no_limite(criar, grupos=None, limite=LIMITE_BYTES_FIGURA):
+    while True:
+        figura = criar() if grupos is None else criar(grupos)
+        tamanho = len(pio.to_json(figura, validate=False))
+        if tamanho <= limite or grupos is None or grupos <= 1:
+            return figura, tamanho
+        grupos //= 2
@@ -0,0 +1,177 @@
+import copy
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Tamanho máximo dos n-gramas indexados na busca de substring
+TAMANHO_NGRAMA = 3
+# Campos da busca das guias, todos com o mesmo peso: a ordem do resultado vem do
+# tipo de acerto (valor igual, começo do valor, trecho do valor)
+CAMPOS_BUSCA = ['Ped. Cliente', 'Nr.pedido', 'Produto', 'Modelo', 'Fantasia']
+VALOR_IGUAL, COMECO, TRECHO = 0, 1, 2
+
+
+# Texto comparável na busca: sem acentos e sem diferença de maiúsculas
+# ('Abraçadeira' -> 'abracadeira')
+def normalizar_busca(texto):
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+# Posições (ordenadas) das linhas de cada valor distinto da coluna
+def _posicoes_por_valor(serie):
+    codigos, valores = pd.factorize(serie)
+    ordem = np.argsort(codigos, kind='stable')
+    limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+    return {valor: ordem[limites[i]:limites[i + 1]] for i, valor in enumerate(valores)}
+
+
+# Busca de substring por n-gramas (1 a 3 caracteres) sobre os valores distintos
+# (normalizados) de uma coluna de texto. Buscas curtas saem direto da lista do
+# n-grama; as mais longas intersectam as listas de cada trigrama e só conferem
+# os candidatos. Os valores que começam com o texto saem de uma busca binária
+# nos valores ordenados. As linhas de cada valor ficam agrupadas (`_linhas`,
+# fatiada por `_limites`), então o custo de uma busca depende dos acertos, não
+# do tamanho da coluna.
+class IndiceSubstring:
+    def __init__(self, serie):
+        # Normaliza só os valores distintos; valores que ficam iguais ('Ação' e
+        # 'acao') passam a ter o mesmo código
+        codigos, distintos = pd.factorize(serie)
+        normalizados, valores = pd.factorize(np.array([normalizar_busca(valor) for valor in distintos], dtype=object))
+        codigos = np.append(normalizados, -1)[codigos]
+        self.valores = list(valores)
+        # Índice de prefixo: valores em ordem alfabética, um prefixo é um intervalo
+        self._ordenados = np.array(sorted(range(len(self.valores)), key=self.valores.__getitem__), dtype=np.intp)
+        self._textos_ordenados = np.array([self.valores[codigo] for codigo in self._ordenados], dtype=object)
+        self._linhas = np.argsort(codigos, kind='stable')
+        self._limites = np.searchsorted(codigos[self._linhas], np.arange(len(self.valores) + 1))
+        ngramas = defaultdict(list)
+        for codigo, valor in enumerate(self.valores):
+            vistos = {valor[i:i + n] for n in range(1, TAMANHO_NGRAMA + 1) for i in range(len(valor) - n + 1)}
+            for ngrama in vistos:
+                ngramas[ngrama].append(codigo)
+        self._ngramas = {ngrama: np.array(codigos, dtype=np.intp) for ngrama, codigos in ngramas.items()}
+
+    def _valores_com(self, texto):
+        vazio = np.array([], dtype=np.intp)
+        if len(texto) <= TAMANHO_NGRAMA:
+            return self._ngramas.get(texto, vazio)
+        listas = [self._ngramas.get(texto[i:i + TAMANHO_NGRAMA]) for i in range(len(texto) - TAMANHO_NGRAMA + 1)]
+        if any(lista is None for lista in listas):
+            return vazio
+        candidatos = min(listas, key=len)
+        for lista in listas:
+            candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+        return np.array([codigo for codigo in candidatos if texto in self.valores[codigo]], dtype=np.intp)
+
+    # Códigos dos valores que começam com `texto`
+    def _valores_comecando(self, texto):
+        inicio = np.searchsorted(self._textos_ordenados, texto, side='left')
+        fim = np.searchsorted(self._textos_ordenados, texto + '\U0010ffff', side='left')
+        return self._ordenados[inicio:fim]
+
+    # Posições das linhas cujo valor contém `texto` (já normalizado) e o tipo de
+    # acerto de cada uma (VALOR_IGUAL, COMECO ou TRECHO)
+    def buscar(self, texto):
+        codigos = self._valores_com(texto)
+        acerto = np.full(len(codigos), TRECHO, dtype=np.int8)
+        acerto[np.isin(codigos, self._valores_comecando(texto))] = COMECO
+        acerto[[self.valores[codigo] == texto for codigo in codigos]] = VALOR_IGUAL
+        # Junta as fatias de `_linhas` de cada código sem laço em Python
+        inicios = self._limites[codigos]
+        tamanhos = self._limites[codigos + 1] - inicios
+        deslocamentos = np.repeat(inicios - (np.cumsum(tamanhos) - tamanhos), tamanhos)
+        posicoes = self._linhas[np.arange(tamanhos.sum()) + deslocamentos]
+        return posicoes, np.repeat(acerto, tamanhos)
+
+
+# Busca única das guias sobre CAMPOS_BUSCA, sem acentos e sem diferença de
+# maiúsculas. Cada palavra do texto precisa aparecer em algum campo. Devolve as
+# posições por relevância: primeiro as linhas com algum campo igual à palavra,
+# depois as que têm um campo começando com ela, depois as que a contêm em
+# qualquer ponto (com várias palavras vale o pior acerto entre elas); empates
+# na ordem das linhas.
+class IndiceBusca:
+    def __init__(self, df, campos=CAMPOS_BUSCA):
+        self.campos = {campo: IndiceSubstring(df[campo]) for campo in campos if campo in df}
+
+    # Posições (crescentes) das linhas com `termo` e o melhor acerto de cada uma
+    def _acertos(self, termo):
+        posicoes, acertos = [], []
+        for indice in self.campos.values():
+            linhas, acerto = indice.buscar(termo)
+            posicoes.append(linhas)
+            acertos.append(acerto)
+        posicoes, acertos = np.concatenate(posicoes), np.concatenate(acertos)
+        ordem = np.lexsort((acertos, posicoes))
+        posicoes, acertos = posicoes[ordem], acertos[ordem]
+        _, primeiras = np.unique(posicoes, return_index=True)
+        return posicoes[primeiras], acertos[primeiras]
+
+    def buscar(self, texto):
+        termos = normalizar_busca(texto).split()
+        if not termos:
+            return np.array([], dtype=np.intp)
+        posicoes, acertos = self._acertos(termos[0])
+        for termo in termos[1:]:
+            outras, outros = self._acertos(termo)
+            posicoes, em_uma, em_outra = np.intersect1d(posicoes, outras, assume_unique=True, return_indices=True)
+            acertos = np.maximum(acertos[em_uma], outros[em_outra])
+        return posicoes[np.lexsort((posicoes, acertos))]
+
+
+# Índices dos filtros das guias: posições por cliente, por setor, por status e
+# a busca (IndiceBusca). Um filtro vira a interseção das posições em vez de uma
+# varredura do DataFrame inteiro.
+class IndiceFiltros:
+    def __init__(self, df):
+        self.total = len(df)
+        self.clientes = df['Fantasia'].dropna().unique().tolist()
+        self.por_cliente = _posicoes_por_valor(df['Fantasia'])
+        self.por_setor = _posicoes_por_valor(df['Setor'])
+        self.por_status = _posicoes_por_valor(df['Status'])
+        self.busca = IndiceBusca(df)
+
+    # O status muda com o tempo ('Atrasado') sem mudar o resto dos dados: refaz
+    # só as posições por status e reaproveita os outros índices
+    def com_status(self, status):
+        novo = copy.copy(self)
+        novo.por_status = _posicoes_por_valor(status)
+        return novo
+
+    # Posições das linhas que atendem a todos os filtros informados (None = sem
+    # filtro; `status` pode ser uma lista). `dentro` restringe a um subconjunto já
+    # conhecido. Em ordem crescente, ou por relevância quando há `busca`.
+    # Devolve None quando nenhum filtro se aplica.
+    def posicoes(self, cliente=None, status=None, busca=None, dentro=None, setor=None):
+        vazio = np.array([], dtype=np.intp)
+        conjuntos = []
+        if dentro is not None:
+            conjuntos.append(dentro)
+        if cliente is not None:
+            conjuntos.append(self.por_cliente.get(cliente, vazio))
+        if setor is not None:
+            conjuntos.append(self.por_setor.get(setor, vazio))
+        if isinstance(status, str):
+            conjuntos.append(self.por_status.get(status, vazio))
+        elif status is not None:
+            conjuntos.append(np.sort(np.concatenate([vazio] + [self.por_status.get(s, vazio) for s in status])))
+        if busca:
+            conjuntos.append(self.busca.buscar(busca))
+        if not conjuntos:
+            return None
+
+        # A busca (se houver) fica por último para manter a ordem por relevância
+        ranqueados = conjuntos.pop() if busca else None
+        conjuntos.sort(key=len)
+        if ranqueados is not None:
+            conjuntos.append(ranqueados)
+        resultado = conjuntos[0]
+        for conjunto in conjuntos[1:]:
+            marcados = np.zeros(self.total, dtype=bool)
+            marcados[resultado] = True
+            resultado = conjunto[marcados[conjunto]]
+        return resultado
@@ -0,0 +1,325 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openpyxl
+import pandas as pd
+
+from pedidos.preparo import CLIENTES_EXCLUIDOS, COLUNAS_OCULTAS, UNIDADES_EXCLUIDAS
+
+log = logging.getLogger(__name__)
+
+# Colunas de data da planilha do ERP; datas vazias chegam como '/  /'
+COLUNAS_DATA = ['Dt.pedido', 'Dt.fat.', 'Prev.entrega']
+
+# Exportações do ERP: PEDIDOS_VOLPE7.XLSX, PEDIDOS_VOLPE8.XLSX, ...
+DIR_PLANILHAS = 'planilha'
+PADRAO_PLANILHA = re.compile(r'PEDIDOS_VOLPE(\d+)\.xlsx$', re.IGNORECASE)
+
+# Uma linha da planilha é identificada pelo pedido e pelo produto
+CHAVE_LINHA = ['Nr.pedido', 'Produto']
+
+# Diretório onde fica a cópia colunar (Parquet) de cada planilha já lida
+DIR_CACHE_PADRAO = os.path.join(DIR_PLANILHAS, '.cache')
+# Formato da cópia colunar; cópias de outro formato são refeitas a partir do XLSX
+VERSAO_CACHE = 2
+
+# Linhas do XLSX convertidas por vez na leitura em blocos
+TAMANHO_BLOCO = 20_000
+# Linhas descartadas na leitura (UNIDADES_EXCLUIDAS, CLIENTES_EXCLUIDOS) ficam só
+# com as chaves e esta marca, para que uma exportação mais nova que descarta a
+# linha continue escondendo a versão das exportações antigas
+COLUNA_EXCLUIDA = '_excluida'
+
+
+def _hash_conteudo(caminho, tamanho_bloco=1 << 20):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+# A cópia colunar já sai sem COLUNAS_OCULTAS e com as linhas descartadas
+# reduzidas à chave, então as listas entram na identidade dela: mudar uma delas
+# refaz as cópias a partir do XLSX
+def _regras_cache():
+    regras = json.dumps([COLUNAS_OCULTAS, UNIDADES_EXCLUIDAS, CLIENTES_EXCLUIDOS], ensure_ascii=False)
+    return hashlib.sha1(regras.encode('utf-8')).hexdigest()[:16]
+
+
+def _caminho_metadados(caminho, dir_cache):
+    # Um arquivo de metadados por planilha de origem, identificado pelo caminho absoluto
+    chave = hashlib.sha1(os.path.abspath(caminho).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(dir_cache, f'{chave}.json')
+
+
+def _texto_uniforme(serie):
+    # Parquet exige um tipo por coluna: texto com valores mistos vira string,
+    # preservando os nulos
+    if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) not in ('string', 'empty', 'boolean'):
+        return serie.where(serie.isna(), serie.astype(str))
+    return serie
+
+
+def _normalizar_colunas(df):
+    # Datas viram datetime (vazias -> NaT) e o texto fica com um tipo por coluna
+    df = df.copy()
+    for coluna in COLUNAS_DATA:
+        if coluna in df.columns:
+            df[coluna] = pd.to_datetime(df[coluna], errors='coerce')
+    for coluna in df.columns:
+        df[coluna] = _texto_uniforme(df[coluna])
+    return df
+
+
+# Nomes repetidos no cabeçalho ganham sufixo .1, .2, ... como no pd.read_excel
+def _nomes_colunas(cabecalho):
+    vistos = {}
+    nomes = []
+    for nome in cabecalho:
+        nome = str(nome)
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f'{nome}.{vistos[nome]}'
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+def _marcar_excluidas(bloco):
+    excluida = pd.Series(False, index=bloco.index)
+    if 'UN' in bloco.columns:
+        excluida |= bloco['UN'].isin(UNIDADES_EXCLUIDAS)
+    if 'Fantasia' in bloco.columns:
+        excluida |= bloco['Fantasia'].isin(CLIENTES_EXCLUIDOS)
+    if not excluida.any():
+        return bloco.assign(**{COLUNA_EXCLUIDA: False})
+    return pd.concat([
+        bloco[~excluida].assign(**{COLUNA_EXCLUIDA: False}),
+        bloco.loc[excluida, CHAVE_LINHA].assign(**{COLUNA_EXCLUIDA: True}),
+    ])
+
+
+# Lê o XLSX em modo streaming (openpyxl read_only), TAMANHO_BLOCO linhas por vez:
+# cada bloco já sai sem as colunas ocultas, com as datas convertidas e sem as
+# linhas descartadas, e vai para buffers por coluna. O pico de memória fica perto
+# do DataFrame final mais um bloco, em vez do modelo do livro inteiro.
+def _ler_xlsx_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    livro = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = livro.worksheets[0].iter_rows(values_only=True)
+        nomes = _nomes_colunas(next(linhas, ()))
+        manter = [i for i, nome in enumerate(nomes) if nome not in COLUNAS_OCULTAS]
+        colunas = [nomes[i] for i in manter]
+        buffers = {coluna: [] for coluna in colunas + [COLUNA_EXCLUIDA]}
+        for lote in iter(lambda: list(itertools.islice(linhas, tamanho_bloco)), []):
+            registros = []
+            for linha in lote:
+                if len(linha) < len(nomes):
+                    linha = linha + (None,) * (len(nomes) - len(linha))
+                if any(valor is not None for valor in linha):
+                    registros.append([linha[i] for i in manter])
+            bloco = _marcar_excluidas(_normalizar_colunas(pd.DataFrame.from_records(registros, columns=colunas)))
+            for coluna in buffers:
+                buffers[coluna].append(bloco[coluna])
+    finally:
+        livro.close()
+
+    # Junta coluna por coluna, liberando os blocos de cada uma em seguida
+    df = {}
+    for coluna in list(buffers):
+        partes = buffers.pop(coluna)
+        df[coluna] = _texto_uniforme(pd.concat(partes, ignore_index=True)) if partes else pd.Series(dtype=object)
+    return pd.DataFrame(df, copy=False)
+
+
+def _ler_metadados(caminho_meta):
+    try:
+        with open(caminho_meta, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_atomico(caminho, escrever):
+    temporario = f'{caminho}.tmp'
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+
+def _gravar_metadados(caminho_meta, metadados):
+    def escrever(destino):
+        with open(destino, 'w', encoding='utf-8') as arquivo:
+            json.dump(metadados, arquivo)
+    _gravar_atomico(caminho_meta, escrever)
+
+
+def ler_planilha(caminho, dir_cache=DIR_CACHE_PADRAO, so_cache=False):
+    # Lê a planilha do ERP usando a cópia em Parquet quando a origem não mudou.
+    # A chave é (caminho, tamanho, mtime, sha256): tamanho e mtime iguais dispensam
+    # o hash; se só o mtime mudou (arquivo copiado de novo), o hash decide.
+    # Com `so_cache`, devolve None em vez de ler o XLSX.
+    inicio = time.perf_counter()
+    estado = os.stat(caminho)
+    caminho_meta = _caminho_metadados(caminho, dir_cache)
+    metadados = _ler_metadados(caminho_meta)
+
+    sha = None
+    if metadados is not None:
+        mesmo_arquivo = metadados.get('tamanho') == estado.st_size and metadados.get('mtime_ns') == estado.st_mtime_ns
+        if not mesmo_arquivo and metadados.get('tamanho') == estado.st_size:
+            sha = _hash_conteudo(caminho)
+            mesmo_arquivo = sha == metadados.get('sha256')
+        caminho_parquet = os.path.join(dir_cache, metadados.get('parquet', ''))
+        if (mesmo_arquivo and metadados.get('formato') == VERSAO_CACHE and metadados.get('regras') == _regras_cache()
+                and os.path.exists(caminho_parquet)):
+            df = pd.read_parquet(caminho_parquet)
+            if metadados.get('mtime_ns') != estado.st_mtime_ns:
+                metadados['mtime_ns'] = estado.st_mtime_ns
+                _gravar_metadados(caminho_meta, metadados)
+            log.info('%s: %d linhas do cache colunar em %.1f ms', caminho, len(df), (time.perf_counter() - inicio) * 1000)
+            return df
+    if so_cache:
+        return None
+
+    df = _ler_xlsx_em_blocos(caminho)
+    tempo_xlsx = time.perf_counter() - inicio
+    sha = sha or _hash_conteudo(caminho)
+    nome_parquet = f'{sha[:32]}.parquet'
+    try:
+        os.makedirs(dir_cache, exist_ok=True)
+        _gravar_atomico(os.path.join(dir_cache, nome_parquet), lambda destino: df.to_parquet(destino, index=False))
+        _gravar_metadados(caminho_meta, {
+            'origem': os.path.abspath(caminho),
+            'tamanho': estado.st_size,
+            'mtime_ns': estado.st_mtime_ns,
+            'sha256': sha,
+            'parquet': nome_parquet,
+            'formato': VERSAO_CACHE,
+            'regras': _regras_cache(),
+        })
+        # A versão anterior da mesma planilha não é mais útil
+        if metadados is not None and metadados.get('parquet') not in (None, nome_parquet):
+            try:
+                os.remove(os.path.join(dir_cache, metadados['parquet']))
+            except OSError:
+                pass
+    except OSError as e:
+        # Sem permissão de escrita o painel continua funcionando, só sem o cache
+        log.warning('não foi possível gravar o cache de %s: %s', caminho, e)
+    log.info('%s: %d linhas lidas do XLSX em %.1f ms', caminho, len(df), tempo_xlsx * 1000)
+    return df
+
+
+# Planilhas de pedidos do diretório, da mais antiga para a mais nova (pelo número
+# da exportação no nome; empate decidido pelo mtime)
+def listar_planilhas(diretorio=DIR_PLANILHAS):
+    encontradas = []
+    for nome in os.listdir(diretorio):
+        correspondencia = PADRAO_PLANILHA.match(nome)
+        if correspondencia:
+            caminho = os.path.join(diretorio, nome)
+            encontradas.append((int(correspondencia.group(1)), os.path.getmtime(caminho), caminho))
+    return [caminho for _, _, caminho in sorted(encontradas)]
+
+
+def _ler_cronometrado(caminho, dir_cache):
+    inicio = time.perf_counter()
+    df = ler_planilha(caminho, dir_cache)
+    return df, time.perf_counter() - inicio
+
+
+# Raiz do projeto (onde está o pacote pedidos), para os processos de conversão
+RAIZ_PACOTE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Converte uma planilha em um processo Python novo (`python -m pedidos.ingestao
+# CAMINHO DIR_CACHE`), que só importa este módulo: não reexecuta o script
+# principal como os processos do multiprocessing com spawn/forkserver fariam com
+# sist.py sob `streamlit run`. O DataFrame volta pela cópia colunar que o
+# processo grava; se ele falhar ou não conseguir gravar o cache, a planilha é
+# lida aqui mesmo.
+def _converter_em_processo(caminho, dir_cache):
+    inicio = time.perf_counter()
+    ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ_PACOTE, os.environ.get('PYTHONPATH')])))
+    try:
+        subprocess.run([sys.executable, '-m', 'pedidos.ingestao', caminho, dir_cache], env=ambiente, check=True)
+        df = ler_planilha(caminho, dir_cache, so_cache=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        log.warning('falha ao converter %s em outro processo: %s', caminho, e)
+        df = None
+    if df is None:
+        df = ler_planilha(caminho, dir_cache)
+    return df, time.perf_counter() - inicio
+
+
+# Junta todas as exportações do diretório em um único DataFrame. As planilhas
+# sem cópia colunar válida são lidas em paralelo, cada uma em um processo
+# (_converter_em_processo: o openpyxl ocupa a CPU e segura o GIL). Quando a
+# mesma linha (CHAVE_LINHA) aparece em mais de uma exportação, vale a da mais nova,
+# mesmo que a mais nova a descarte (COLUNA_EXCLUIDA). Devolve o DataFrame e
+# um relatório com arquivo, origem (parquet/xlsx), linhas e tempo de cada planilha.
+def ler_planilhas(diretorio=DIR_PLANILHAS, dir_cache=None, max_processos=None):
+    dir_cache = dir_cache or os.path.join(diretorio, '.cache')
+    caminhos = listar_planilhas(diretorio)
+    if not caminhos:
+        raise FileNotFoundError(f"nenhuma planilha PEDIDOS_VOLPE*.XLSX em {diretorio}")
+
+    quadros, relatorio = {}, {}
+    a_converter = []
+    for caminho in caminhos:
+        inicio = time.perf_counter()
+        df = ler_planilha(caminho, dir_cache, so_cache=True)
+        if df is None:
+            a_converter.append(caminho)
+        else:
+            quadros[caminho] = df
+            relatorio[caminho] = ('parquet', time.perf_counter() - inicio)
+
+    if len(a_converter) == 1:
+        for caminho in a_converter:
+            quadros[caminho], segundos = _ler_cronometrado(caminho, dir_cache)
+            relatorio[caminho] = ('xlsx', segundos)
+    elif a_converter:
+        # As threads só esperam os processos de conversão
+        processos = min(len(a_converter), max_processos or os.cpu_count() or 1)
+        with ThreadPoolExecutor(processos) as executor:
+            resultados = executor.map(_converter_em_processo, a_converter, [dir_cache] * len(a_converter))
+            for caminho, (df, segundos) in zip(a_converter, resultados):
+                quadros[caminho] = df
+                relatorio[caminho] = ('xlsx', segundos)
+
+    # Mesmo esquema para todas: chaves como texto e colunas na ordem em que aparecem
+    colunas = list(dict.fromkeys(coluna for df in quadros.values() for coluna in df.columns))
+    normalizados = []
+    for caminho in caminhos:
+        df = quadros[caminho].reindex(columns=colunas)
+        for coluna in CHAVE_LINHA:
+            df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+        normalizados.append(df)
+    uniao = pd.concat(normalizados, ignore_index=True)
+    uniao = uniao.drop_duplicates(subset=CHAVE_LINHA, keep='last')
+    uniao = uniao[~uniao[COLUNA_EXCLUIDA].eq(True)].drop(columns=COLUNA_EXCLUIDA).reset_index(drop=True)
+
+    linhas = []
+    for caminho in caminhos:
+        origem, segundos = relatorio[caminho]
+        linhas.append({'arquivo': caminho, 'origem': origem, 'linhas': len(quadros[caminho]), 'ms': round(segundos * 1000, 1)})
+        log.info('%s: %d linhas (%s) em %.1f ms', caminho, len(quadros[caminho]), origem, segundos * 1000)
+    log.info('%d planilhas, %d linhas depois de remover repetidas', len(caminhos), len(uniao))
+    return uniao, linhas
+
+
+# Processo de conversão de _converter_em_processo: lê o XLSX e grava a cópia colunar
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[pedidos.ingestao] %(message)s')
+    ler_planilha(sys.argv[1], sys.argv[2])
@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from pedidos.ingestao import CHAVE_LINHA, COLUNA_EXCLUIDA, ler_planilha
+
+# Colunas comparadas entre duas exportações e colunas só para identificar a linha
+COLUNAS_COMPARADAS = ['Qtd.', 'Valor Unit.', 'Dt.fat.', 'Prev.entrega']
+COLUNAS_DESCRITIVAS = ['Fantasia', 'Ped. Cliente', 'Modelo']
+# Tipos de mudança, na ordem de prioridade: uma linha faturada e reprogramada
+# na mesma exportação aparece como 'Faturada'
+MUDANCAS = ['Nova', 'Removida', 'Faturada', 'Reprogramada', 'Alterada']
+
+
+# Colunas (arrays) das linhas válidas de uma exportação bruta, sem as marcadas
+# como excluídas na leitura, com as colunas comparadas nos tipos certos
+def _linhas_exportacao(df):
+    validas = ~df[COLUNA_EXCLUIDA].eq(True).to_numpy() if COLUNA_EXCLUIDA in df else slice(None)
+    linhas = {}
+    for coluna in CHAVE_LINHA:
+        linhas[coluna] = df[coluna].to_numpy(dtype=object)[validas].astype(str)
+    for coluna in COLUNAS_DESCRITIVAS:
+        linhas[coluna] = df[coluna].to_numpy(dtype=object)[validas] if coluna in df else np.full(len(linhas['Produto']), None)
+    for coluna in ['Qtd.', 'Valor Unit.']:
+        linhas[coluna] = pd.to_numeric(df[coluna], errors='coerce').to_numpy(dtype=float)[validas]
+    for coluna in ['Dt.fat.', 'Prev.entrega']:
+        linhas[coluna] = pd.to_datetime(df[coluna], errors='coerce').to_numpy(dtype='datetime64[ns]')[validas]
+    return linhas
+
+
+# Chave inteira de cada linha (Nr.pedido + Produto) nas duas exportações: os
+# textos são fatorados juntos, então a mesma chave tem o mesmo número nas duas
+def _chaves(antiga, nova):
+    tamanho = len(antiga['Produto'])
+    codigos = []
+    for coluna in CHAVE_LINHA:
+        codigo, valores = pd.factorize(np.concatenate([antiga[coluna], nova[coluna]]))
+        codigos.append((codigo.astype(np.int64), len(valores)))
+    (pedido, _), (produto, produtos) = codigos
+    chave = pedido * max(produtos, 1) + produto
+    return chave[:tamanho], chave[tamanho:]
+
+
+# Uma linha por chave (vale a última, como em ler_planilhas)
+def _sem_repetidas(linhas, chave):
+    repetidas = pd.Index(chave).duplicated(keep='last')
+    if not repetidas.any():
+        return linhas, chave
+    return {coluna: valores[~repetidas] for coluna, valores in linhas.items()}, chave[~repetidas]
+
+
+# Coluna sem valores (NaN ou NaT) no tipo de `modelo`
+def _vazia(modelo, linhas):
+    return np.full(linhas, np.datetime64('NaT') if modelo.dtype.kind == 'M' else np.nan, dtype=modelo.dtype)
+
+
+def _diferentes(a, b):
+    return ~((a == b) | (pd.isna(a) & pd.isna(b)))
+
+
+def _tomar(linhas, posicoes):
+    return {coluna: valores[posicoes] for coluna, valores in linhas.items()}
+
+
+# Mudanças entre duas exportações brutas (ler_planilha): junção por hash na
+# chave da linha e comparação vetorizada de Qtd., Valor Unit., Dt.fat. e
+# Prev.entrega. Devolve uma linha por item que mudou, com o tipo de mudança
+# ('Mudança') e os valores antes e depois de cada coluna comparada.
+def comparar_exportacoes(antiga, nova):
+    antiga, nova = _linhas_exportacao(antiga), _linhas_exportacao(nova)
+    chave_antiga, chave_nova = _chaves(antiga, nova)
+    antiga, chave_antiga = _sem_repetidas(antiga, chave_antiga)
+    nova, chave_nova = _sem_repetidas(nova, chave_nova)
+
+    posicao_na_antiga = pd.Index(chave_antiga).get_indexer(chave_nova)
+    comuns = np.flatnonzero(posicao_na_antiga >= 0)
+    na_nova = np.zeros(len(chave_antiga), dtype=bool)
+    na_nova[posicao_na_antiga[comuns]] = True
+
+    antes = _tomar(antiga, posicao_na_antiga[comuns])
+    depois = _tomar(nova, comuns)
+    diferente = {coluna: _diferentes(antes[coluna], depois[coluna]) for coluna in COLUNAS_COMPARADAS}
+    faturada = np.isnat(antes['Dt.fat.']) & ~np.isnat(depois['Dt.fat.'])
+    reprogramada = diferente['Prev.entrega']
+    alterada = diferente['Qtd.'] | diferente['Valor Unit.'] | diferente['Dt.fat.']
+    tipo = np.select([faturada, reprogramada, alterada], ['Faturada', 'Reprogramada', 'Alterada'], default='')
+    mudou = np.flatnonzero(tipo != '')
+
+    def quadro(mudanca, identificacao, antes, depois):
+        tamanho = len(identificacao['Produto'])
+        colunas = {'Mudança': np.broadcast_to(np.asarray(mudanca, dtype=object), tamanho)}
+        for coluna in CHAVE_LINHA + COLUNAS_DESCRITIVAS:
+            colunas[coluna] = identificacao[coluna]
+        for coluna in COLUNAS_COMPARADAS:
+            vazia = _vazia(antiga[coluna], tamanho)
+            colunas[f'{coluna} antes'] = vazia if antes is None else antes[coluna]
+            colunas[f'{coluna} depois'] = vazia if depois is None else depois[coluna]
+        return pd.DataFrame(colunas)
+
+    novas = _tomar(nova, posicao_na_antiga < 0)
+    removidas = _tomar(antiga, ~na_nova)
+    mudancas = pd.concat([
+        quadro('Nova', novas, None, novas),
+        quadro('Removida', removidas, removidas, None),
+        quadro(tipo[mudou], _tomar(depois, mudou), _tomar(antes, mudou), _tomar(depois, mudou)),
+    ], ignore_index=True)
+    mudancas['Mudança'] = pd.Categorical(mudancas['Mudança'], categories=MUDANCAS)
+    return mudancas.sort_values(['Mudança'] + CHAVE_LINHA, kind='stable', ignore_index=True)
+
+
+# Mudanças entre dois arquivos de exportação, lidos pelo cache colunar da ingestão
+# (por padrão o .cache do diretório das planilhas, como em ler_planilhas)
+def comparar_planilhas(caminho_antigo, caminho_novo, dir_cache=None):
+    dir_cache = dir_cache or os.path.join(os.path.dirname(caminho_novo), '.cache')
+    return comparar_exportacoes(ler_planilha(caminho_antigo, dir_cache), ler_planilha(caminho_novo, dir_cache))
+
+
+# Itens por tipo de mudança, com zero para os tipos que não ocorreram
+def contar_mudancas(mudancas):
+    return mudancas['Mudança'].value_counts().reindex(MUDANCAS, fill_value=0).astype(int).to_dict()
+
+
+# Identidade de um arquivo para chavear caches (tamanho e mtime, como o cache
+# colunar da ingestão)
+def identidade_arquivo(caminho):
+    estado = os.stat(caminho)
+    return os.path.abspath(caminho), estado.st_size, estado.st_mtime_ns
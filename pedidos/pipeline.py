@@ -0,0 +1,53 @@
+import json
+import os
+from datetime import datetime
+
+from pedidos.agregados import somar_cubo
+from pedidos.atualizacao import ServicoIngestao
+from pedidos.ingestao import DIR_PLANILHAS
+from pedidos.status import STATUS
+
+# Onde `python -m pedidos` grava os instantâneos quando não se informa --saida
+DIR_SAIDA_PADRAO = 'snapshots'
+
+
+# Roda ingestão -> status -> setor -> agregados sem Streamlit, do mesmo jeito que
+# o painel (ServicoIngestao, sem o observador de arquivos). Devolve o DataFrame
+# preparado e o resumo de indicadores de `resumir`. Com um `armazem`
+# (pedidos.armazem), a carga também fica registrada nele.
+def executar(diretorio=DIR_PLANILHAS, agora=None, armazem=None):
+    agora = agora or datetime.now()
+    servico = ServicoIngestao(diretorio, armazem=armazem)
+    servico.carregar(agora)
+    _, df, indicadores = servico.dados(agora)
+    return df, resumir(indicadores, agora, servico.relatorio)
+
+
+# Indicadores em tipos simples (serializáveis em JSON): pedidos, itens por
+# status, itens por setor e status e valor total por status
+def resumir(indicadores, agora, planilhas=None):
+    valor = somar_cubo(indicadores['cubo'], 'Status')['valor'].reindex(STATUS, fill_value=0)
+    return {
+        'agora': agora.isoformat(),
+        'planilhas': planilhas or [],
+        'total_pedidos': int(indicadores['total_pedidos']),
+        'total_itens': int(indicadores['total_itens']),
+        'pendentes': int(indicadores['status'].get('Pendente', 0)),
+        'atrasados': int(indicadores['status'].get('Atrasado', 0)),
+        'status': {status: int(indicadores['status'].get(status, 0)) for status in STATUS},
+        'setor': indicadores['setor'],
+        'valor_por_status': {status: round(float(total), 2) for status, total in valor.items()},
+    }
+
+
+# Grava o DataFrame preparado (Parquet) e o resumo (JSON) em `destino`, com o
+# instante de referência no nome. Devolve os dois caminhos.
+def gravar(df, resumo, destino=DIR_SAIDA_PADRAO):
+    os.makedirs(destino, exist_ok=True)
+    marca = datetime.fromisoformat(resumo['agora']).strftime('%Y%m%d_%H%M')
+    caminho_dados = os.path.join(destino, f'pedidos_{marca}.parquet')
+    caminho_resumo = os.path.join(destino, f'indicadores_{marca}.json')
+    df.to_parquet(caminho_dados, index=False)
+    with open(caminho_resumo, 'w', encoding='utf-8') as arquivo:
+        json.dump(resumo, arquivo, ensure_ascii=False, indent=2)
+    return caminho_dados, caminho_resumo
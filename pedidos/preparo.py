@@ -0,0 +1,51 @@
+import pandas as pd
+
+from pedidos.compactacao import compactar
+from pedidos.desempenho import Medicao
+from pedidos.setores import atribuir_setor
+from pedidos.sla import calcular_prazos
+from pedidos.status import CLIENTES_PEDIDO_DESDOBRADO, atualizar_status_desdobrados, classificar_status
+
+# Colunas da planilha do ERP que o painel não usa
+COLUNAS_OCULTAS = ['Emp', 'Código', 'Razão', 'UF', 'Tp.Venda', 'F.Pagto', 'Vendedor', '% Comissão', 'Operador', '% Comissão.1', '% ICMS', '% IPI', 'Vl.Desc.']
+
+# Linhas que não entram no controle: itens vendidos a granel e clientes fora da carteira
+UNIDADES_EXCLUIDAS = ['KG']
+CLIENTES_EXCLUIDOS = ['PRIME', 'AMD 5', 'AMD 10', 'FREXCO', 'SESC INTERLAGOS', 'RODRIGO MELO', 'FOXMIX', 'CCINTER ANTÔNIO', 'L A REFRIGERACAO', 'NACAO NATURAL']
+
+
+# Deriva o DataFrame usado pelo painel a partir da planilha bruta, sem alterar a
+# entrada: valores numéricos, exclusões, datas, setor, prazo e status, já nos
+# tipos compactos de pedidos.compactacao. `agora` é a referência para decidir o
+# que está atrasado; `clientes` são os da regra de pedidos desdobrados. Com uma
+# `medicao` (pedidos.desempenho), cada passo vira uma etapa medida.
+def preparar_pedidos(bruto, agora, clientes=CLIENTES_PEDIDO_DESDOBRADO, medicao=None):
+    medicao = medicao or Medicao(False)
+    with medicao.etapa('valores_e_exclusoes', len(bruto)):
+        df = bruto.drop(columns=COLUNAS_OCULTAS, errors='ignore')
+
+        # Valores ausentes ou inválidos contam como 0
+        df['Valor Unit.'] = pd.to_numeric(df['Valor Unit.'], errors='coerce').fillna(0)
+        df['Qtd.'] = pd.to_numeric(df['Qtd.'], errors='coerce').fillna(0)
+        df['Valor Total'] = df['Valor Unit.'] * df['Qtd.']
+
+        df = df[~df['UN'].isin(UNIDADES_EXCLUIDAS) & ~df['Fantasia'].isin(CLIENTES_EXCLUIDOS)].copy()
+
+    with medicao.etapa('status_desdobrados', len(df)):
+        df['Status'] = 'Pendente'
+        atualizar_status_desdobrados(df, clientes)
+
+    with medicao.etapa('datas', len(df)):
+        df['Dt.pedido'] = pd.to_datetime(df['Dt.pedido'], format='%d/%m/%Y', dayfirst=True)
+        df['Dt.fat.'] = pd.to_datetime(df['Dt.fat.'], errors='coerce')
+        df['Prev.entrega'] = pd.to_datetime(df['Prev.entrega'], errors='coerce')
+    with medicao.etapa('setor', len(df)):
+        df['Setor'] = atribuir_setor(df['Nr.pedido'])
+    # Prazo efetivo (previsão do ERP ou SLA de pedidos.sla): é ele que decide 'Atrasado'
+    with medicao.etapa('prazo_sla', len(df)):
+        df['Prazo'] = calcular_prazos(df)
+    with medicao.etapa('classificar_status', len(df)):
+        df['Status'] = classificar_status(df, agora)
+        df = df.drop(columns='Status_Atualizado')
+    with medicao.etapa('compactar', len(df)):
+        return compactar(df)
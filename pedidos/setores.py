@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+
+# Setores por onde passa um item pendente. Embalagem e Expedição ainda não têm
+# regra de roteamento e ficam vazios.
+SETORES = ['Separação', 'Compras', 'Embalagem', 'Expedição']
+
+
+# Roteia cada linha para um setor: pedidos desdobrados (com '-' no Nr.pedido)
+# dependem de compra; os demais vão direto para a separação. O texto é
+# examinado uma vez por número de pedido distinto.
+def atribuir_setor(nr_pedido):
+    codigos, unicos = pd.factorize(nr_pedido.astype(str))
+    desdobrado = pd.Series(unicos, dtype=object).str.contains('-', regex=False).to_numpy()
+    setor = np.where(desdobrado, SETORES.index('Compras'), SETORES.index('Separação'))
+    return pd.Categorical.from_codes(setor[codigos].astype(np.int8), categories=SETORES)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# Prazos de atendimento (SLA) contados a partir de 'Dt.pedido'. Cada regra pode
+# se restringir a setores, clientes (Fantasia) e unidades (UN), com um valor ou
+# uma lista; sem restrição vale para todas as linhas. Quando várias regras valem
+# para a mesma linha ganha a mais específica (mais critérios) e, no empate, a que
+# vem depois. Com 'dias_uteis' contam só dias úteis (segunda a sexta, fora FERIADOS).
+#
+#   {'setor': 'Compras', 'dias': 5, 'dias_uteis': True}
+#   {'setor': 'Separação', 'cliente': ['TELHANORTE BH', 'TELHANORTE GUARULHOS'], 'dias': 1}
+#   {'unidade': 'CX', 'dias': 3}
+REGRAS_SLA = [
+    # Regra que antes existia só na guia de Separação
+    {'setor': 'Separação', 'dias': 2},
+]
+
+# Datas (AAAA-MM-DD) que não contam como dia útil
+FERIADOS = []
+
+# Critério da regra -> coluna dos dados preparados
+CRITERIOS_SLA = {'setor': 'Setor', 'cliente': 'Fantasia', 'unidade': 'UN'}
+
+
+def _somar_dias(datas, dias, dias_uteis, feriados):
+    if not dias_uteis:
+        return datas + pd.Timedelta(days=dias)
+    resultado = pd.Series(pd.NaT, index=datas.index, dtype='datetime64[ns]')
+    validas = datas.notna().to_numpy()
+    dias_pedido = datas.to_numpy()[validas].astype('datetime64[D]')
+    resultado[validas] = np.busday_offset(dias_pedido, dias, roll='forward', holidays=feriados).astype('datetime64[ns]')
+    return resultado
+
+
+# Prazo SLA de cada linha (NaT quando nenhuma regra se aplica), compilado regra
+# a regra sobre a tabela inteira
+def calcular_prazos_sla(df, regras=REGRAS_SLA, feriados=FERIADOS):
+    prazo = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    especificidade = np.full(len(df), -1)
+    for regra in regras:
+        nivel = sum(criterio in regra for criterio in CRITERIOS_SLA)
+        aplica = especificidade <= nivel
+        for criterio, coluna in CRITERIOS_SLA.items():
+            if criterio in regra:
+                valores = regra[criterio] if isinstance(regra[criterio], (list, tuple, set)) else [regra[criterio]]
+                aplica &= df[coluna].isin(valores).to_numpy()
+        if aplica.any():
+            prazo[aplica] = _somar_dias(df.loc[aplica, 'Dt.pedido'], regra['dias'], regra.get('dias_uteis', False), feriados)
+            especificidade[aplica] = nivel
+    return prazo
+
+
+# Prazo efetivo: o que vencer primeiro entre a previsão de entrega do ERP e o SLA
+def calcular_prazos(df, regras=REGRAS_SLA, feriados=FERIADOS):
+    sla = calcular_prazos_sla(df, regras, feriados)
+    return df['Prev.entrega'].where(df['Prev.entrega'].notna() & ~(sla < df['Prev.entrega']), sla)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# Clientes (Fantasia) cujos pedidos desdobrados seguem a regra de sufixo:
+# o pedido base e os desdobramentos anteriores contam como entregues e só o
+# desdobramento de maior sufixo (ex.: 0025131-02) continua pendente
+CLIENTES_PEDIDO_DESDOBRADO = ['COLINA']
+
+
+# Separa 'Nr.pedido' em número base e sufixo numérico (NaN quando não há sufixo).
+# Um pedido tem vários itens, então o texto é separado só uma vez por número distinto.
+def separar_pedido(nr_pedido):
+    codigos, unicos = pd.factorize(nr_pedido.astype(str))
+    partes = pd.Series(unicos, dtype=object).str.extract(r'^(?P<base>[^-]*)-?(?P<sufixo>.*)$')
+    return pd.DataFrame({
+        'base': partes['base'].to_numpy()[codigos],
+        'sufixo': pd.to_numeric(partes['sufixo'], errors='coerce').to_numpy()[codigos],
+    }, index=nr_pedido.index)
+
+
+# Define o status dos pedidos desdobrados dos clientes configurados e marca em
+# 'Status_Atualizado' as linhas que não devem passar pela regra de datas
+def atualizar_status_desdobrados(df, clientes=CLIENTES_PEDIDO_DESDOBRADO):
+    regra = df['Fantasia'].isin(clientes)
+    pedidos = separar_pedido(df.loc[regra, 'Nr.pedido'])
+    maior_sufixo = pedidos.groupby('base')['sufixo'].transform('max')
+    ultimo_desdobramento = pedidos['sufixo'].notna() & (pedidos['sufixo'] == maior_sufixo)
+    df.loc[regra, 'Status'] = np.where(ultimo_desdobramento, 'Pendente', 'Entregue')
+    df['Status_Atualizado'] = regra
+
+
+# Categorias da coluna 'Status', na ordem usada pelos filtros do painel
+STATUS = ['Pendente', 'Atrasado', 'Entregue']
+
+
+# Classifica todas as linhas de uma vez: mantém o status das linhas marcadas em
+# 'Status_Atualizado', faturadas viram 'Entregue' e as demais ficam 'Atrasado'
+# ou 'Pendente' conforme o 'Prazo' (pedidos.sla; sem prazo conta como pendente)
+def classificar_status(df, agora):
+    condicoes = [
+        df['Status_Atualizado'].to_numpy(dtype=bool),
+        df['Dt.fat.'].notna().to_numpy(),
+        (df['Prazo'] < agora).to_numpy(),
+    ]
+    # Trabalha com os códigos das categorias para não comparar strings
+    codigos_atuais = pd.Categorical(df['Status'], categories=STATUS).codes
+    escolhas = [codigos_atuais, STATUS.index('Entregue'), STATUS.index('Atrasado')]
+    codigos = np.select(condicoes, escolhas, default=STATUS.index('Pendente'))
+    return pd.Categorical.from_codes(codigos.astype(np.int8), categories=STATUS)
+
+
+# Linhas pendentes que podem virar 'Atrasado' quando o prazo passar
+def pendentes_com_prazo(df, clientes=CLIENTES_PEDIDO_DESDOBRADO):
+    return (
+        (df['Status'] == 'Pendente')
+        & df['Dt.fat.'].isna()
+        & df['Prazo'].notna()
+        & ~df['Fantasia'].isin(clientes)
+    )
+
+
+# Posições das linhas de pendentes_com_prazo ordenadas pelo prazo.
+# As que vencem até `agora` formam um prefixo, achado por busca binária, então
+# cada avaliação só toca as linhas que venceram desde a anterior.
+class FilaPrazos:
+    def __init__(self, df, clientes=CLIENTES_PEDIDO_DESDOBRADO):
+        candidatas = np.flatnonzero(pendentes_com_prazo(df, clientes).to_numpy())
+        prazos = df['Prazo'].to_numpy()[candidatas]
+        ordem = np.argsort(prazos, kind='stable')
+        self.posicoes = candidatas[ordem]
+        self.prazos = prazos[ordem]
+        self.vencidas = 0
+
+    def _corte(self, agora):
+        return int(np.searchsorted(self.prazos, np.datetime64(pd.Timestamp(agora), 'ns'), side='left'))
+
+    # Posições que venceram desde a última chamada; o tempo só avança, então um
+    # `agora` anterior não devolve nada
+    def vencer(self, agora):
+        corte = self._corte(agora)
+        if corte <= self.vencidas:
+            return self.posicoes[:0]
+        novas = self.posicoes[self.vencidas:corte]
+        self.vencidas = corte
+        return novas
@@ -1,8 +1,33 @@
-import locale
+import logging
+import os
+import uuid
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-from datetime import datetime,timedelta
+from datetime import datetime
+from pedidos.agregados import somar_cubo
+from pedidos.armazem import VARIAVEL_ARMAZEM, abrir_configurado
+from pedidos.atualizacao import ServicoIngestao
+from pedidos.compactacao import relatorio_memoria
+from pedidos.consultas import VARIAVEL_BACKEND, ConsultasArrow, ConsultasPandas, ConsultasSQLite, backend_configurado
+from pedidos.desempenho import VARIAVEL_LOG, Medicao, anexar_log
+from pedidos.graficos import TOP_PRODUTOS, create_percentage_chart, create_value_bar_chart, create_value_bar_chart2, figura_no_limite
+from pedidos.indices import IndiceFiltros
+from pedidos.ingestao import DIR_PLANILHAS, listar_planilhas
+from pedidos.mudancas import MUDANCAS, comparar_planilhas, contar_mudancas, identidade_arquivo
+from pedidos.status import STATUS
+
+# Mensagens da ingestão (loggers pedidos.*) no console do servidor; o handler é
+# instalado uma vez por processo, não a cada rerun
+log_pedidos = logging.getLogger('pedidos')
+if not log_pedidos.handlers:
+    saida_log = logging.StreamHandler()
+    saida_log.setFormatter(logging.Formatter('[%(name)s] %(message)s'))
+    log_pedidos.addHandler(saida_log)
+    log_pedidos.setLevel(logging.INFO)
+
+# Copy-on-write: fatias e cópias rasas dos dados compartilhados entre as sessões
+# nunca escrevem neles; uma alteração copia só a coluna alterada
+pd.set_option('mode.copy_on_write', True)
 
 # Configuração da página com título e favicon
 st.set_page_config(
@@ -12,12 +37,6 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-# Configuração inicial do locale e da página
-try:
-    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-except locale.Error:
-    locale.setlocale(locale.LC_ALL, 'C')  # ou 'en_US.UTF-8' como fallback
-
 # Estilos customizados do Streamlit
 st.markdown(
     """
@@ -58,45 +77,169 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Ocultar colunas desnecessárias
-colunas_para_ocultar = ['Emp', 'Código', 'Razão', 'UF', 'Tp.Venda', 'F.Pagto', 'Vendedor', '% Comissão', 'Operador', '% Comissão.1', '% ICMS', '% IPI', 'Vl.Desc.']
-
-
-# Carregar os dados e ocultar colunas desnecessárias
-@st.cache_data
-def load_data(file_path='planilha/PEDIDOS_VOLPE8.XLSX'):
-    try:
-        df = pd.read_excel(file_path)
-        return df.drop(columns=colunas_para_ocultar, errors='ignore')
-    except Exception as e:
-        st.error(f"Erro ao carregar os dados: {e}")
-        return pd.DataFrame()
-
-df = load_data()
-
-df['Valor Unit.'] = pd.to_numeric(df['Valor Unit.'], errors='coerce')
-df['Qtd.'] = pd.to_numeric(df['Qtd.'], errors='coerce')
-
-# Substituir NaN por 0, ou trate de outra forma, conforme a necessidade
-df['Valor Unit.'].fillna(0, inplace=True)
-df['Qtd.'].fillna(0, inplace=True)
-
-# Agora é seguro multiplicar
-df['Valor Total'] = df['Valor Unit.'] * df['Qtd.']
-
-print(df[['Valor Unit.', 'Qtd.', 'Valor Total']])
-
-# Excluindo linhas com uma condição específica
-# Exemplo: Remover linhas onde a coluna 'UN' é igual a 'KG'
-df = df[df['UN'] != 'KG']
+# Medição das etapas desta execução: ligada pelo painel de desempenho do ADM ou
+# pelo log em arquivo (variável PEDIDOS_LOG_DESEMPENHO)
+caminho_log_desempenho = os.environ.get(VARIAVEL_LOG)
+if 'sessao' not in st.session_state:
+    st.session_state['sessao'] = uuid.uuid4().hex[:8]
+    st.session_state['execucoes'] = 0
+st.session_state['execucoes'] += 1
+medicao = Medicao(st.session_state.get('painel_desempenho', False) or bool(caminho_log_desempenho))
+
+def formatar_moeda(valor):
+    # Formato brasileiro (1.234,56) sem depender do locale do servidor
+    return f"{valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+# Valores em R$ ficam numéricos no DataFrame; a formatação acontece só na exibição,
+# sobre as linhas exibidas (Styler), no mesmo formato das métricas e dos gráficos
+COLUNAS_MOEDA = ['Valor Unit.', 'Valor Total']
+
+def com_moeda(tabela, colunas=COLUNAS_MOEDA):
+    # O backend arrow devolve a página como pyarrow.Table (só as linhas exibidas)
+    if not isinstance(tabela, pd.DataFrame):
+        tabela = tabela.to_pandas()
+    # Página vazia vai sem Styler: o Streamlit converte os valores com astype(str),
+    # que falha em categóricas vazias no pandas 2.2 com numpy 2
+    if tabela.empty:
+        return tabela
+    colunas = [coluna for coluna in colunas if coluna in tabela.columns]
+    return tabela.style.format(lambda valor: f"R$ {formatar_moeda(valor)}", subset=colunas, na_rep='')
+
+# Tabelas paginadas no servidor: só a página visível é serializada e enviada ao
+# navegador, qualquer que seja o tamanho da carteira
+TAMANHOS_PAGINA = [50, 100, 250, 500]
+SEM_ORDENACAO = "(ordem da planilha)"
+
+def exibir_tabela(posicoes, colunas, chave):
+    col_ordem, col_direcao, col_tamanho, col_pagina = st.columns(4)
+    with col_ordem:
+        coluna = st.selectbox("Ordenar por", [SEM_ORDENACAO] + colunas, key=f"{chave}_ordem")
+    with col_direcao:
+        direcao = st.selectbox("Ordem", ["Crescente", "Decrescente"], key=f"{chave}_direcao")
+    with col_tamanho:
+        tamanho = st.selectbox("Linhas por página", TAMANHOS_PAGINA, key=f"{chave}_tamanho")
+
+    total_paginas = max(1, -(-len(posicoes) // tamanho))
+    # Depois de um filtro a página guardada pode não existir mais
+    if st.session_state.get(f"{chave}_pagina", 1) > total_paginas:
+        st.session_state[f"{chave}_pagina"] = total_paginas
+    with col_pagina:
+        pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, step=1, key=f"{chave}_pagina")
+
+    # Ordena só a coluna escolhida e recorta a página (no backend de consultas)
+    inicio, fim = (pagina - 1) * tamanho, pagina * tamanho
+    ordenar_por = None if coluna == SEM_ORDENACAO else coluna
+    with medicao.etapa('st.dataframe', min(tamanho, max(0, len(posicoes) - inicio))):
+        tabela = consultas.pagina(posicoes, colunas, ordenar_por, direcao == "Crescente", inicio, fim)
+        st.dataframe(com_moeda(tabela), use_container_width=True)
+
+# Busca das guias (pedidos.indices.IndiceBusca): sem acentos e sem diferença de
+# maiúsculas; sem ordenação escolhida, a tabela vem por relevância
+ROTULO_BUSCA = "Buscar por pedido, nº do pedido, produto, modelo ou cliente:"
+
+# Itens e valor por status direto do cubo de agregados (de um setor ou da
+# carteira toda), em cache por versão e minuto. Sem filtro de cliente nem busca
+# é o mesmo que agrupar as linhas filtradas, sem tocar nos itens.
+@st.cache_resource(max_entries=8)
+def por_status_do_cubo(_indicadores, versao, agora, setor=None):
+    cubo = _indicadores['cubo']
+    if setor is not None:
+        cubo = cubo[cubo['Setor'] == setor]
+    somado = somar_cubo(cubo, 'Status')
+    return {status: (int(linha['itens']), float(linha['valor'])) for status, linha in somado.iterrows() if linha['itens']}
+
+# Itens e valor por status das linhas filtradas: do cubo quando só há filtro de
+# status (e de setor), das linhas quando há cliente ou busca
+def por_status_filtrado(posicoes, cliente, busca, status, setor=None):
+    if cliente is not None or (busca or '').strip():
+        return consultas.por_status(posicoes)
+    por_status = por_status_do_cubo(indicadores, versao, minuto, setor)
+    if status is None:
+        return por_status
+    escolhidos = [status] if isinstance(status, str) else status
+    return {s: valores for s, valores in por_status.items() if s in escolhidos}
+
+# Itens e valor por status das linhas exibidas, abaixo da tabela
+def resumo_por_status(por_status):
+    partes = [f"{status}: {por_status[status][0]} (R$ {formatar_moeda(por_status[status][1])})" for status in STATUS if status in por_status]
+    if partes:
+        st.caption(" · ".join(partes))
+
+# Backend das consultas das guias (variável PEDIDOS_BACKEND: pandas, arrow ou
+# sqlite). A tabela Arrow é montada uma vez por versão; a cada minuto só o Status
+# é trocado. O sqlite consulta o armazém, atualizado junto com os dados.
+BACKEND = backend_configurado()
+
+# Serviço que mantém os dados da exportação mais nova de `planilha/` e aplica
+# só as linhas que mudaram quando o ERP grava uma nova planilha (um por processo).
+# Com o backend sqlite ou PEDIDOS_ARMAZEM, as mudanças também vão para o armazém
+# SQLite, que guarda o histórico de status.
+@st.cache_resource
+def iniciar_ingestao():
+    servico = ServicoIngestao(DIR_PLANILHAS, armazem=abrir_configurado(BACKEND == 'sqlite'))
+    servico.iniciar()
+    return servico
+
+# Os dados preparados ficam em cache pela versão do serviço, então interações com
+# os filtros não refazem o pipeline. `agora` vai truncado ao minuto: o status
+# 'Atrasado' é reavaliado no máximo uma vez por minuto. É um único objeto por
+# processo, compartilhado por todas as sessões (cache_resource não copia) e
+# tratado como somente leitura: as guias trabalham com fatias (iloc por posições).
+# A versão devolvida é a dos dados (dados() lê as duas juntas); servico.versao só
+# serve de chave para buscar, pois uma recarga pode terminar a qualquer momento.
+@st.cache_resource(max_entries=2)
+def prepare_orders(_servico, versao, agora):
+    return _servico.dados(agora)
 
-# Exemplo: Remover linhas com 'Fantasia' em uma lista específica
-df = df[~df['Fantasia'].isin(['PRIME', 'AMD 5', 'AMD 10', 'FREXCO','SESC INTERLAGOS','RODRIGO MELO','FOXMIX','CCINTER ANTÔNIO', 'L A REFRIGERACAO','NACAO NATURAL'])]
-
-df['Status'] = 'Pendente'
+try:
+    with medicao.etapa('iniciar_ingestao'):
+        servico = iniciar_ingestao()
+except Exception as e:
+    st.error(f"Erro ao carregar os dados: {e}")
+    st.stop()
+
+# Índices dos filtros das guias, montados uma vez por versão dos dados; só as
+# posições por status são refeitas quando o minuto muda
+@st.cache_resource(max_entries=2)
+def construir_indices(_df, versao):
+    return IndiceFiltros(_df)
+
+@st.cache_resource(max_entries=2)
+def indices_do_minuto(_df, versao, agora):
+    return construir_indices(_df, versao).com_status(_df['Status'])
+
+minuto = datetime.now().replace(second=0, microsecond=0)
+with medicao.etapa('prepare_orders') as registro:
+    versao, compartilhado, indicadores = prepare_orders(servico, servico.versao, minuto)
+    registro['linhas'] = len(compartilhado)
+with medicao.etapa('indices_do_minuto', len(compartilhado)):
+    indice = indices_do_minuto(compartilhado, versao, minuto)
+
+# Sem o armazém (diretório sem permissão de escrita) o sqlite cai para o pandas
+if BACKEND == 'sqlite' and servico.armazem is None:
+    BACKEND = 'pandas'
+
+@st.cache_resource(max_entries=2)
+def tabela_arrow(_df, versao):
+    return ConsultasArrow.de_dataframe(_df, construir_indices(_df, versao).busca)
+
+@st.cache_resource(max_entries=2)
+def consultas_do_minuto(_df, _indice, _armazem, versao, agora, backend):
+    if backend == 'arrow':
+        return tabela_arrow(_df, versao).com_status(_df['Status'])
+    if backend == 'sqlite':
+        return ConsultasSQLite(_armazem)
+    return ConsultasPandas(_df, _indice)
+
+with medicao.etapa(f'consultas_{BACKEND}', len(compartilhado)):
+    consultas = consultas_do_minuto(compartilhado, indice, servico.armazem, versao, minuto, BACKEND)
+
+# Cópia rasa para esta execução: com copy-on-write, qualquer alteração em `df`
+# (ou em uma fatia dele) fica só nesta sessão
+df = compartilhado.copy(deep=False)
 
 # Calcular o total de pedidos únicos
-total_pedidos = df['Ped. Cliente'].nunique()
+total_pedidos = indicadores['total_pedidos']
 
 # Exibir o total de pedidos como uma linha adicional
 estatisticas_gerais = pd.DataFrame({
@@ -104,171 +247,53 @@ estatisticas_gerais = pd.DataFrame({
     'Valor': [total_pedidos]
 })
 
-def atualizar_status_colina(df):
-    status_dict = {}
-
-    # Filtra apenas os pedidos com fantasia "COLINA"
-    pedidos_colina = df[df['Fantasia'] == 'COLINA']['Nr.pedido'].astype(str)
-
-    # Itera para definir status
-    for pedido in pedidos_colina:
-        if '-' in pedido:
-            base = pedido.split('-')[0]
-            status_dict[base] = 'Entregue'
-            status_dict[pedido] = 'Pendente'
-        else:
-            if pedido not in status_dict:
-                status_dict[pedido] = 'Entregue'
-
-    # Ajusta os status com base nos sufixos maiores
-    for pedido in pedidos_colina:
-        if '-' in pedido:
-            base = pedido.split('-')[0]
-            sufixo_num = int(pedido.split('-')[1])
-            for i in range(sufixo_num):
-                status_dict[f"{base}-{i:02}"] = 'Entregue'
-
-    # Atualiza a coluna 'Status' apenas para pedidos da 'COLINA'
-    df['Status'] = df.apply(
-        lambda row: status_dict.get(str(row['Nr.pedido']), row['Status']) if row['Fantasia'] == 'COLINA' else row['Status'], 
-        axis=1
-    )
-
-    # Cria uma coluna auxiliar para indicar quais linhas foram atualizadas
-    df['Status_Atualizado'] = df['Fantasia'] == 'COLINA'
-
-# Aplica a função para atualizar o status para pedidos "COLINA"
-atualizar_status_colina(df)
-
-# Define a função `update_status` somente para pedidos não atualizados
-now = datetime.now()
-df['Dt.fat.'] = pd.to_datetime(df['Dt.fat.'], errors='coerce')
-df['Prev.entrega'] = pd.to_datetime(df['Prev.entrega'], errors='coerce')
-
-def update_status(row):
-    if row['Status_Atualizado']:
-        return row['Status']  # Retorna o status já definido pela função anterior
-    if pd.isnull(row['Dt.fat.']):
-        return 'Atrasado' if row['Prev.entrega'] < now else 'Pendente'
-    return 'Entregue'
-
-# Atualiza status, respeitando as linhas que já foram atualizadas
-df['Status'] = df.apply(update_status, axis=1)
-
-# Remove a coluna auxiliar
-df.drop(columns='Status_Atualizado', inplace=True)
-
 # Contagem de pedidos pendentes e atrasados
-pendente = (df['Status'] == 'Pendente').sum()
-atrasado = (df['Status'] == 'Atrasado').sum()
+pendente = indicadores['status']['Pendente']
+atrasado = indicadores['status']['Atrasado']
 
 # Seleção de perfil
 perfil = st.sidebar.selectbox("Selecione o Perfil", ["ADM", "Separação", "Compras"])
 
-# Converte colunas de data e calcula 'Valor Total'
-df['Dt.pedido'] = pd.to_datetime(df['Dt.pedido'], format='%d/%m/%Y', dayfirst=True)
-df['Valor Total'] = df['Valor Unit.'] * df['Qtd.']
-df['Valor Total'] = df['Valor Total'].apply(lambda x: locale.currency(x, grouping=True, symbol=None))
-
-def calcular_pendentes_atrasados(df):
-    pendentes = (df['Status'] == 'Pendente').sum()
-    atrasados = (df['Status'] == 'Atrasado').sum()
-    return pendentes, atrasados
-
-def create_value_bar_chart2(df, Produto, Modelo):
-    # Calcular a frequência de cada valor na coluna especificada
-    contagem = df[Produto].value_counts().reset_index()
-    contagem.columns = [Produto, 'Frequência']
-
-    # Mesclar com o DataFrame original para incluir o Modelo no gráfico
-    contagem = contagem.merge(df[[Produto, Modelo]], on=Produto, how='left').drop_duplicates()
-
-    # Criar o gráfico de barras interativo com hover data
-    bar_chart2 = px.bar(
-        contagem, 
-        x=Produto, 
-        y='Frequência', 
-        title='Total por Referência',
-        labels={Produto: 'Código', 'Frequência': 'Quantidade'},
-        color='Frequência', 
-        color_continuous_scale='Viridis',
-        hover_data={Produto: True, 'Frequência': True, Modelo: True}  # Incluir o Modelo no hover
-    )
-
-    # Customizações adicionais
-    bar_chart2.update_layout(
-        xaxis_title='Código do Produto',
-        yaxis_title='Número de Pedidos',
-        xaxis_tickangle=-45,
-        bargap=0.2,  # Ajuste do espaçamento entre as barras
-        xaxis=dict(
-            range=[0, 30],  # Define o intervalo inicial exibido
-            fixedrange=False  # Permite rolagem horizontal
-        )
-    )
-
-    # Retornar o gráfico
-    return bar_chart2
-
-# Criação de gráficos
-def create_percentage_chart(df):
-    # Contando o total de pedidos por status
-    total_pedidos = df['Status'].value_counts()
-    
-    # Calculando a porcentagem
-    total = total_pedidos.sum()
-    percentage = (total_pedidos / total) * 100
-    
-    percentage_summary = percentage.reset_index()
-    percentage_summary.columns = ['Status', 'Percentual']
-    
-    # Gráfico de pizza para mostrar a porcentagem
-    pie_chart = px.pie(percentage_summary, 
-                       values='Percentual', 
-                       names='Status', 
-                       title='Porcentagem de Pedidos por Status')
-
-    return pie_chart
-
-# Função para criar o gráfico de barras com o valor total em R$ apenas para status Pendente e Atrasado
-def create_value_bar_chart(df):
-    # Converte a coluna 'Valor Total' para numérico
-    df['Valor Total Numérico'] = df['Valor Total'].apply(lambda x: locale.atof(x.strip()))
-
-    # Filtra o DataFrame para incluir os status "Pendente", "Atrasado" e "Entregue"
-    df_filtrado = df[df['Status'].isin(['Pendente', 'Atrasado', 'Entregue'])]
-
-    # Agrupa os dados por status e calcula o valor total em R$
-    total_por_status = df_filtrado.groupby('Status')['Valor Total Numérico'].sum().reset_index()
-    total_por_status.columns = ['Status', 'Valor Total']
-
-    # Cria o gráfico de barras
-    bar_chart = px.bar(
-        total_por_status, 
-        x='Status', 
-        y='Valor Total', 
-        text='Valor Total', 
-        title='Valor Total por Status',
-        labels={'Valor Total': 'Valor Total (R$)', 'Status': '  '}
-    )
-    
-    return bar_chart
 
+# Itens em aberto (pendentes e atrasados) de um setor
+def em_aberto(setor):
+    return indicadores['setor'][setor]['Pendente'] + indicadores['setor'][setor]['Atrasado']
+
+# Figuras do Dashboard em cache por (gráfico, versão dos dados, minuto): reruns
+# só de widgets (radio, selectbox) reaproveitam a figura pronta. Cada figura cabe
+# em LIMITE_BYTES_FIGURA (pedidos.graficos); o "Total por Referência" perde
+# produtos para "Outros" se passar.
+@st.cache_resource(max_entries=6)
+def figura_do_dashboard(grafico, _indicadores, versao, agora):
+    cubo = _indicadores['cubo']
+    if grafico == 'create_value_bar_chart2':
+        return figura_no_limite(lambda top: create_value_bar_chart2(cubo, _indicadores['produtos'], 'Produto', 'Modelo', top), TOP_PRODUTOS)
+    criar = create_percentage_chart if grafico == 'create_percentage_chart' else create_value_bar_chart
+    return figura_no_limite(lambda: criar(somar_cubo(cubo, 'Status')))
+
+def exibir_grafico(grafico):
+    with medicao.etapa(grafico):
+        figura, _ = figura_do_dashboard(grafico, indicadores, versao, minuto)
+        st.plotly_chart(figura, use_container_width=True)
+
+@medicao.cronometrada
 def guia_dashboard():
     # Cabeçalho para Estatísticas Gerais
     st.markdown("<h3>Estatísticas Gerais <small style='font-size: 0.4em;'>(mês atual)</small></h3>", unsafe_allow_html=True)
     
+    por_status = somar_cubo(indicadores['cubo'], 'Status')
+
     # Coloca as estatísticas na horizontal no topo da tela
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric("Total de Pedidos", total_pedidos)
     with col2:
-        st.metric("Total de Itens", len(df))
+        st.metric("Total de Itens", int(por_status['itens'].sum()))
     with col3:
-        st.metric("Total de Produtos Pendentes", pendente)
+        st.metric("Total de Produtos Pendentes", int(por_status['itens'].get('Pendente', 0)))
     with col4:
-        st.metric("Total de Produtos Atrasados", atrasado)
+        st.metric("Total de Produtos Atrasados", int(por_status['itens'].get('Atrasado', 0)))
     
     # Espaçamento vertical entre as seções
     st.write(" ")
@@ -278,18 +303,16 @@ def guia_dashboard():
     col_grafico1, col_grafico2 = st.columns(2)
     
     with col_grafico1:
-        st.plotly_chart(create_percentage_chart(df), use_container_width=True)
+        exibir_grafico('create_percentage_chart')
     
     with col_grafico2:
-        st.plotly_chart(create_value_bar_chart(df), use_container_width=True)
+        exibir_grafico('create_value_bar_chart')
     
     # Espaçamento vertical entre as linhas de gráficos
     st.write(" ")
 
      # Segunda linha de gráficos que ocupa toda a largura
-    st.plotly_chart(create_value_bar_chart2(df, 'Produto', 'Modelo'), use_container_width=True)
-
-    separacao_df, compras_df = mover_pedidos(df)
+    exibir_grafico('create_value_bar_chart2')
 
     st.markdown("<h3>Pedidos Pendentes<small style='font-size: 0.4em;'> (por setor)</small></h3>", unsafe_allow_html=True)
 
@@ -297,160 +320,194 @@ def guia_dashboard():
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        st.metric("Separação", len(separacao_df))  # Contagem de pedidos em separação
+        st.metric("Separação", em_aberto('Separação'))  # Contagem de pedidos em separação
     with col2:
-        st.metric("Compras", len(compras_df))      # Contagem de pedidos em compras
+        st.metric("Compras", em_aberto('Compras'))      # Contagem de pedidos em compras
     with col3:
         st.metric("Embalagem", '?')                   # Você pode atualizar isso conforme necessário
     with col4:
         st.metric("Expedição", '?')                   # Você pode atualizar isso conforme necessário
 
 
+@medicao.cronometrada
 def guia_carteira():
     st.title("Carteira")
     
-    # Filtrando o DataFrame para ocultar linhas com UN igual a KG
-    df_filtrado = df[df['UN'] != 'KG']
+    # Itens em KG já ficam fora dos dados preparados
+    cliente_selecionado = st.selectbox("Selecione o Cliente", ["Todos os Clientes"] + indice.clientes)
     
-    cliente_selecionado = st.selectbox("Selecione o Cliente", ["Todos os Clientes"] + df_filtrado['Fantasia'].unique().tolist())
-    pedidos_cliente = df_filtrado if cliente_selecionado == "Todos os Clientes" else df_filtrado[df_filtrado['Fantasia'] == cliente_selecionado]
-    
-    pedido_filtro = st.text_input("Filtrar por número de pedido:")
+    busca = st.text_input(ROTULO_BUSCA)
     status_filtro = st.selectbox("Filtrar por Status", ["Todos", "Pendente", "Atrasado", "Entregue"])
     
-    if pedido_filtro:
-        pedidos_cliente = pedidos_cliente[pedidos_cliente['Ped. Cliente'].astype(str).str.contains(pedido_filtro)]
-    
-    if status_filtro != "Todos":
-        pedidos_cliente = pedidos_cliente[pedidos_cliente['Status'] == status_filtro]
+    cliente = None if cliente_selecionado == "Todos os Clientes" else cliente_selecionado
+    status = None if status_filtro == "Todos" else status_filtro
+    posicoes = consultas.filtrar(cliente=cliente, status=status, busca=busca)
 
     # Exibir número de linhas após a filtragem
-    total_linhas_depois = pedidos_cliente.shape[0]
-    st.write(f"Número de linhas: {total_linhas_depois}")
+    st.write(f"Número de linhas: {len(posicoes)}")
     
-    st.dataframe(pedidos_cliente, use_container_width=True)
-    total_valor = (pedidos_cliente['Valor Unit.'] * pedidos_cliente['Qtd.']).sum()
-    st.metric("Total (R$)", locale.currency(total_valor, grouping=True, symbol=None))
+    exibir_tabela(posicoes, df.columns.tolist(), "carteira")
+    por_status = por_status_filtrado(posicoes, cliente, busca, status)
+    resumo_por_status(por_status)
+    st.metric("Total (R$)", formatar_moeda(sum(valor for _, valor in por_status.values())))
 
+@medicao.cronometrada
 def guia_notificacoes():
     st.title("Notificações")
     st.write("Todas novidades do Sistema e Atualizações serão notificadas neste campo.")
 
-def mover_pedidos(df):
-    # Filtra os pedidos que têm '-' no Nr.pedido
-    pedidos_com_hifen = df[df['Nr.pedido'].astype(str).str.contains('-')]
-    pedidos_sem_hifen = df[~df['Nr.pedido'].astype(str).str.contains('-')]
-    
-    # Atualiza o DataFrame de separação e compras
-    compras_df = pedidos_com_hifen[pedidos_com_hifen['Status'].isin(['Pendente'])]
-    separacao_df = pedidos_sem_hifen[pedidos_sem_hifen['Status'] == 'Pendente']
-    
-    return separacao_df, compras_df
+# As guias dos setores mostram os itens em aberto. O status vem pronto dos dados
+# preparados (prazos de pedidos.sla), o mesmo do Dashboard.
+EM_ABERTO = ['Pendente', 'Atrasado']
+
+# Itens em aberto de um setor, as colunas que têm algum valor neles e os clientes
+# deles. Só dependem dos dados e do minuto: ficam em cache por (versão, minuto,
+# setor, backend), e um rerun de widget não refaz o filtro nem lê as colunas.
+@st.cache_resource(max_entries=8)
+def abertos_do_setor(_consultas, versao, agora, setor, backend):
+    abertos = _consultas.filtrar(setor=setor, status=EM_ABERTO)
+    return abertos, _consultas.colunas_preenchidas(abertos), _consultas.valores('Fantasia', abertos)
+
+# Guia de um setor: filtros por cliente, pedido e status sobre os itens em aberto,
+# só com as colunas que têm algum valor nesses itens
+def guia_do_setor(setor, chave):
+    abertos, colunas, clientes = abertos_do_setor(consultas, versao, minuto, setor, BACKEND)
+    alertas_do_setor(setor)
+
+    cliente_selecionado = st.selectbox("Selecione o Cliente", ["Todos os Clientes"] + clientes)
+    busca = st.text_input(ROTULO_BUSCA)
+    status_filtro = st.selectbox("Filtrar por Status", ["Todos", "Pendente", "Atrasado"])
 
-# Modificações na guia de Separação/Expedição
-def guia_separacao():
-    st.title("Separação")
-    
-    separacao_df, _ = mover_pedidos(df)
-    separacao_df = separacao_df[(separacao_df['Status'] == 'Pendente') | (~separacao_df['Status'].str.contains('-'))]
-    separacao_df = separacao_df.dropna(axis=1, how='all')
-    # Adicionando a lógica para verificar se o pedido está atrasado
-    today = datetime.now()
-
-    # Verificar se a coluna 'Dt. pedido' existe antes de proceder
-    if 'Dt.pedido' in separacao_df.columns:
-        # Convertendo a coluna 'Dt. pedido' para datetime
-        separacao_df['Dt.pedido'] = pd.to_datetime(separacao_df['Dt.pedido'], errors='coerce')
-        
-        # Verificando se a data do pedido é mais antiga que 2 dias a partir de hoje
-        separacao_df['Atrasado'] = (today - separacao_df['Dt.pedido']) > timedelta(days=2)
-        
-        # Atualizando o status para 'Atrasado' se o pedido estiver atrasado e ainda 'Pendente'
-        separacao_df.loc[(separacao_df['Atrasado']) & (separacao_df['Status'] == 'Pendente'), 'Status'] = 'Atrasado'
+    cliente = None if cliente_selecionado == "Todos os Clientes" else cliente_selecionado
+    status = EM_ABERTO if status_filtro == "Todos" else status_filtro
+    if cliente is None and not busca.strip() and status == EM_ABERTO:
+        posicoes = abertos
     else:
-        st.warning("A coluna 'Dt.pedido' não foi encontrada no DataFrame.")
-
-    pendentes_sep, atrasados_sep = calcular_pendentes_atrasados(separacao_df)
-    if pendentes_sep > 0:
-        st.sidebar.markdown(f'<div class="blinking-yellow">Atenção: Você possui {pendentes_sep} produto(s) pendente(s) no total!</div>', unsafe_allow_html=True)
-    if atrasados_sep > 0:
-        st.sidebar.markdown(f'<div class="blinking-red">Atenção: Você possui {atrasados_sep} produto(s) atrasado(s) no total!</div>', unsafe_allow_html=True)
-
-    # Filtros
-    cliente_selecionado = st.selectbox("Selecione o Cliente", ["Todos os Clientes"] + separacao_df['Fantasia'].unique().tolist())
-    separacao_df = separacao_df if cliente_selecionado == "Todos os Clientes" else separacao_df[separacao_df['Fantasia'] == cliente_selecionado]
-
-    pedido_filtro = st.text_input("Filtrar por número de pedido:")
-    status_filtro = st.selectbox("Filtrar por Status", ["Todos", "Pendente", "Atrasado"])
-    
-    if pedido_filtro:
-        separacao_df = separacao_df[separacao_df['Ped. Cliente'].astype(str).str.contains(pedido_filtro)]
-    
-    if status_filtro != "Todos":
-        separacao_df = separacao_df[separacao_df['Status'] == status_filtro]
+        posicoes = consultas.filtrar(cliente=cliente, setor=setor, status=status, busca=busca)
 
     # Exibir número de linhas após a filtragem
-    total_linhas_depois = separacao_df.shape[0]
-    st.write(f"Número de linhas: {total_linhas_depois}")
+    st.write(f"Número de linhas: {len(posicoes)}")
+
+    # Exibe a tabela filtrada e o total específico
+    exibir_tabela(posicoes, colunas, chave)
+    por_status = por_status_filtrado(posicoes, cliente, busca, status, setor)
+    resumo_por_status(por_status)
+    st.metric("Total (R$)", formatar_moeda(sum(valor for _, valor in por_status.values())))
+
+# Alertas da barra lateral com os totais do setor (antes dos filtros)
+def alertas_do_setor(setor):
+    pendentes = indicadores['setor'][setor]['Pendente']
+    atrasados = indicadores['setor'][setor]['Atrasado']
+    if pendentes > 0:
+        st.sidebar.markdown(f'<div class="blinking-yellow">Atenção: Você possui {pendentes} produto(s) pendente(s) no total!</div>', unsafe_allow_html=True)
+    if atrasados > 0:
+        st.sidebar.markdown(f'<div class="blinking-red">Atenção: Você possui {atrasados} produto(s) atrasado(s) no total!</div>', unsafe_allow_html=True)
 
-    # Exibe o DataFrame filtrado e o total específico
-    st.dataframe(separacao_df, use_container_width=True)
-    total_valor = (separacao_df['Valor Unit.'] * separacao_df['Qtd.']).sum()
-    st.metric("Total (R$)", locale.currency(total_valor, grouping=True, symbol=None))
+# Modificações na guia de Separação/Expedição
+@medicao.cronometrada
+def guia_separacao():
+    st.title("Separação")
+    guia_do_setor('Separação', "separacao")
 
 # Modificações na guia de Compras
+@medicao.cronometrada
 def guia_compras():
     st.title("Compras")
-    
-    # DataFrame geral para calcular pendentes e atrasados (antes dos filtros)
-    _, compras_df_geral = mover_pedidos(df)
-    compras_df_geral = compras_df_geral[(compras_df_geral['Status'] == 'Pendente') | (compras_df_geral['Status'].str.contains('-'))]
-    
-    # Calcular o total geral de pendentes e atrasados
-    pendentes_compras_geral, atrasados_compras_geral = calcular_pendentes_atrasados(compras_df_geral)
-    
-    # Notificações baseadas no total geral
-    if pendentes_compras_geral > 0:
-        st.sidebar.markdown(f'<div class="blinking-yellow">Atenção: Você possui {pendentes_compras_geral} produto(s) pendente(s) no total!</div>', unsafe_allow_html=True)
-    if atrasados_compras_geral > 0:
-        st.sidebar.markdown(f'<div class="blinking-red">Atenção: Você possui {atrasados_compras_geral} produto(s) atrasado(s) no total!</div>', unsafe_allow_html=True)
-    
-    # Filtragem para exibição
-    _, compras_df = mover_pedidos(df)
-    compras_df = compras_df[(compras_df['Status'] == 'Pendente') | (compras_df['Status'].str.contains('-'))]
-    compras_df = compras_df.dropna(axis=1, how='all')
-
-    # Aplicação dos filtros ao DataFrame
-    cliente_selecionado = st.selectbox("Selecione o Cliente", ["Todos os Clientes"] + compras_df['Fantasia'].unique().tolist())
-    compras_df = compras_df if cliente_selecionado == "Todos os Clientes" else compras_df[compras_df['Fantasia'] == cliente_selecionado]
+    guia_do_setor('Compras', "compras")
 
-    pedido_filtro = st.text_input("Filtrar por número de pedido:")
-    status_filtro = st.selectbox("Filtrar por Status", ["Todos", "Pendente", "Atrasado"])
     
+# Memória por coluna dos dados preparados, nos tipos naturais e nos compactos
+@st.cache_data(max_entries=1)
+def memoria_por_coluna(_df, versao):
+    return relatorio_memoria(_df)
+
+@medicao.cronometrada
+def guia_depuracao():
+    st.title("Depuração")
+    st.caption(f"Versão {versao} dos dados, {len(df)} linhas, consultas no backend {BACKEND}")
+    with st.expander("Memória por coluna", expanded=True):
+        st.dataframe(
+            memoria_por_coluna(df, versao),
+            use_container_width=True,
+            hide_index=True,
+            column_config={'Redução': st.column_config.NumberColumn(format='%.1f%%')},
+        )
+    with st.expander("Histórico de status"):
+        if servico.armazem is None:
+            st.caption(f"Sem armazém: use {VARIAVEL_BACKEND}=sqlite ou {VARIAVEL_ARMAZEM} para guardar o histórico.")
+            return
+        st.caption(f"Armazém {servico.armazem.caminho}")
+        tempos = servico.armazem.tempos_de_entrega()
+        col1, col2 = st.columns(2)
+        col1.metric("Itens entregues com histórico", len(tempos))
+        col2.metric("Mediana até a entrega (dias)", f"{tempos['dias'].median():.1f}" if len(tempos) else "-")
+        st.dataframe(servico.armazem.ultimas_transicoes(), use_container_width=True, hide_index=True)
+
+# Mudanças entre duas exportações, calculadas uma vez por par de arquivos. A
+# identidade (caminho, tamanho, mtime) é a chave: uma exportação regravada refaz
+# a comparação. Objeto compartilhado e somente leitura, como em prepare_orders.
+@st.cache_resource(max_entries=4)
+def mudancas_entre(antiga, nova):
+    return comparar_planilhas(antiga[0], nova[0])
+
+# Linhas de mudanças exibidas na tabela (a contagem considera todas)
+LIMITE_MUDANCAS = 5000
+
+@medicao.cronometrada
+def guia_mudancas():
+    st.title("Mudanças")
+    planilhas = listar_planilhas(DIR_PLANILHAS)
+    if len(planilhas) < 2:
+        st.info("É preciso ter pelo menos duas exportações em planilha/ para comparar.")
+        return
+    nomes = [os.path.basename(caminho) for caminho in planilhas]
+    caminhos = dict(zip(nomes, planilhas))
+
+    # Por padrão, a exportação mais nova contra a anterior
+    col_antiga, col_nova = st.columns(2)
+    with col_antiga:
+        antiga = st.selectbox("Exportação anterior", nomes, index=len(nomes) - 2)
+    with col_nova:
+        nova = st.selectbox("Exportação nova", nomes, index=len(nomes) - 1)
+    if antiga == nova:
+        st.warning("Escolha duas exportações diferentes.")
+        return
+
+    with medicao.etapa('mudancas_entre') as registro:
+        mudancas = mudancas_entre(identidade_arquivo(caminhos[antiga]), identidade_arquivo(caminhos[nova]))
+        registro['linhas'] = len(mudancas)
+    contagem = contar_mudancas(mudancas)
+    for coluna, tipo in zip(st.columns(len(MUDANCAS)), MUDANCAS):
+        coluna.metric(tipo, contagem[tipo])
+
+    tipos = st.multiselect("Tipos de mudança", MUDANCAS, default=MUDANCAS)
+    pedido_filtro = st.text_input("Filtrar por número de pedido:", key="mudancas_pedido")
+    filtradas = mudancas[mudancas['Mudança'].isin(tipos)]
     if pedido_filtro:
-        compras_df = compras_df[compras_df['Ped. Cliente'].astype(str).str.contains(pedido_filtro)]
-    
-    if status_filtro != "Todos":
-        compras_df = compras_df[compras_df['Status'] == status_filtro]
-
-    total_linhas_depois = compras_df.shape[0]
-    st.write(f"Número de linhas: {total_linhas_depois}")
-
-    # Exibe o DataFrame filtrado e o total específico
-    st.dataframe(compras_df, use_container_width=True)
-    total_valor = (compras_df['Valor Unit.'] * compras_df['Qtd.']).sum()
-    st.metric("Total (R$)", locale.currency(total_valor, grouping=True, symbol=None))
+        filtradas = filtradas[filtradas['Ped. Cliente'].astype(str).str.contains(pedido_filtro, regex=False)]
+
+    st.write(f"Número de linhas: {len(filtradas)}")
+    if len(filtradas) > LIMITE_MUDANCAS:
+        st.caption(f"Mostrando as primeiras {LIMITE_MUDANCAS} linhas.")
+    st.dataframe(
+        com_moeda(filtradas.head(LIMITE_MUDANCAS), [f'Valor Unit. {lado}' for lado in ('antes', 'depois')]),
+        use_container_width=True,
+        hide_index=True,
+    )
 
-    
 # Interface por perfil - mantém a estrutura atual
 if perfil == "ADM":
-    aba = st.sidebar.radio("Escolha uma aba", ["Dashboard", "Carteira", "Notificações"])
+    aba = st.sidebar.radio("Escolha uma aba", ["Dashboard", "Carteira", "Notificações", "Mudanças", "Depuração"])
     if aba == "Dashboard":
         guia_dashboard()
     elif aba == "Carteira":
         guia_carteira()
     elif aba == "Notificações":
         guia_notificacoes()
+    elif aba == "Mudanças":
+        guia_mudancas()
+    elif aba == "Depuração":
+        guia_depuracao()
     # Notificações de pendência e atraso
     if pendente > 0:
         st.sidebar.markdown(f'<div class="blinking-yellow">Atenção: Você possui {pendente} produto(s) pendente(s)!</div>', unsafe_allow_html=True)
@@ -464,3 +521,48 @@ else:
     elif perfil == "Compras":
         guia_compras()
 
+
+# Painel de desempenho (ADM): etapas desta execução, execuções anteriores da
+# sessão e a última carga dos dados feita pelo serviço de ingestão
+EXECUCOES_NO_HISTORICO = 20
+
+def tabela_etapas(etapas):
+    etapas = pd.DataFrame(etapas)
+    etapas['etapa'] = ['↳ ' * nivel + etapa for nivel, etapa in zip(etapas['nivel'], etapas['etapa'])]
+    etapas['linhas'] = etapas['linhas'].astype('Int64')
+    st.dataframe(etapas[['etapa', 'ms', 'linhas']], use_container_width=True, hide_index=True)
+
+def painel_desempenho(registro, historico):
+    with st.expander("Desempenho", expanded=False):
+        st.caption(f"Sessão {registro['sessao']}, execução {registro['execucao']}: {registro['total_ms']:.1f} ms")
+        tabela_etapas(registro['etapas'])
+
+        st.caption("Execuções desta sessão")
+        st.dataframe(
+            pd.DataFrame([{k: r[k] for k in ['execucao', 'quando', 'tela', 'total_ms']} for r in reversed(historico)]),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+        if servico.ultima_carga:
+            carga = servico.ultima_carga
+            st.caption(f"Última carga dos dados (versão {carga['versao']}): leitura {carga['leitura_ms']:.1f} ms, "
+                       f"total {carga['total_ms']:.1f} ms ({carga['descricao']})")
+            tabela_etapas(carga['etapas'])
+
+if perfil == "ADM":
+    st.sidebar.checkbox("Painel de desempenho", key='painel_desempenho')
+
+if medicao.ativa:
+    registro = medicao.registro(
+        sessao=st.session_state['sessao'],
+        execucao=st.session_state['execucoes'],
+        tela=aba if perfil == "ADM" else perfil,
+    )
+    historico = st.session_state.setdefault('historico_desempenho', [])
+    historico.append(registro)
+    del historico[:-EXECUCOES_NO_HISTORICO]
+    if caminho_log_desempenho:
+        anexar_log(registro, caminho_log_desempenho)
+    if perfil == "ADM" and st.session_state.get('painel_desempenho'):
+        painel_desempenho(registro, historico)